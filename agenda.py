@@ -0,0 +1,124 @@
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from database import consultar, agregar, upsert_rows, delete_rows
+
+# ===================================================
+# AGENDA DE CHECK-IN (REGRA ÚNICA PARA HOME, CHECK-IN E ADMIN)
+# ===================================================
+# Para cada paciente a tabela checkin_schedule guarda:
+# - liberado_em: a partir de quando o próximo check-in pode ser feito
+#     novato (nunca fez): data_inicio + 7 dias (Semanal) ou + 15 (Quinzenal)
+#     veterano: último check-in + 6 dias (Semanal) ou + 13 (Quinzenal)
+#     novato sem data_inicio válida: NULL (não é cobrado nem liberado)
+# - proximo_checkin: primeiro dia da semana combinado (dia_checkin) a partir de liberado_em
+# Hoje é dia de cobrar <=> hoje é o dia_semana do paciente e proximo_checkin <= hoje.
+# As datas só mudam quando o paciente envia um check-in ou o admin edita o cadastro,
+# e é aí que atualizar_agenda() é chamada.
+
+TABELA_AGENDA = "checkin_schedule"
+DIAS_SEMANA = {0: "Segunda", 1: "Terça", 2: "Quarta", 3: "Quinta", 4: "Sexta", 5: "Sábado", 6: "Domingo"}
+_INDICE_DIA = {nome: i for i, nome in DIAS_SEMANA.items()}
+
+# Dias de carência (novato, veterano). Frequência diferente de "Semanal" segue a quinzenal.
+CARENCIA = {"Semanal": (7, 6), "Quinzenal": (15, 13)}
+
+def calcular_agenda(df_usuarios, ultimos_checkins, hoje=None):
+    """
+    Aplica a regra para todos os pacientes de uma vez (sem loop).
+    df_usuarios: username, active, dia_checkin, frequencia, data_inicio
+    ultimos_checkins: Series username -> data do último check-in
+    """
+    hoje = pd.Timestamp(hoje or date.today())
+    df = df_usuarios
+    frequencia = df["frequencia"].fillna("").astype(str).str.strip()
+    semanal = (frequencia == "Semanal").to_numpy()
+
+    ultimo = pd.to_datetime(df["username"].map(ultimos_checkins)).dt.normalize()
+    # Novato sem data de início válida fica sem agenda (liberado_em/proximo_checkin NULL):
+    # nunca é cobrado, como nas telas antigas, até o admin preencher a data
+    inicio = pd.to_datetime(df["data_inicio"].astype(str).str.strip(), format="%Y-%m-%d", errors="coerce")
+
+    novato = ultimo.isna().to_numpy()
+    carencia = np.where(novato,
+                        np.where(semanal, CARENCIA["Semanal"][0], CARENCIA["Quinzenal"][0]),
+                        np.where(semanal, CARENCIA["Semanal"][1], CARENCIA["Quinzenal"][1]))
+    base = ultimo.where(~novato, inicio)
+    liberado = base + pd.to_timedelta(carencia, unit="D")
+
+    # Avança até cair no dia da semana combinado
+    dia_semana = df["dia_checkin"].astype(str).str.strip().map(_INDICE_DIA)
+    ajuste = (dia_semana - liberado.dt.weekday) % 7
+    proximo = liberado + pd.to_timedelta(ajuste, unit="D")
+
+    ativo = df["active"].astype(str).str.strip().str.lower().isin(["true", "1", "yes", "on"])
+    return pd.DataFrame({
+        "username": df["username"].to_numpy(),
+        "ativo": ativo.to_numpy(),
+        "dia_semana": dia_semana.astype("Int16").to_numpy(),
+        "frequencia": np.where(semanal, "Semanal", "Quinzenal"),
+        "ultimo_checkin": ultimo.dt.date.to_numpy(),
+        "liberado_em": liberado.dt.date.to_numpy(),
+        "proximo_checkin": proximo.dt.date.to_numpy(),
+    })
+
+def atualizar_agenda(usernames=None):
+    """Recalcula e grava a agenda de todos os pacientes (ou só dos informados)."""
+    filtros = {"username__in": list(usernames)} if usernames is not None else None
+    usuarios = consultar("usuarios", colunas=["username", "role", "active", "dia_checkin", "frequencia", "data_inicio"],
+                         filtros=filtros)
+    if not usuarios.empty:
+        for c in ["role", "active", "dia_checkin", "frequencia", "data_inicio"]:
+            if c not in usuarios.columns: usuarios[c] = None
+        usuarios = usuarios[usuarios["role"] == "paciente"]
+
+    # Quem deixou de existir (ou de ser paciente) sai da agenda
+    if usernames is not None:
+        removidos = set(usernames) - set(usuarios.get("username", []))
+        if removidos:
+            delete_rows(TABELA_AGENDA, {"username__in": list(removidos)})
+    if usuarios.empty: return 0
+
+    ultimos = agregar("checkins", ["username"], {"ultima": ("max", "data")}, filtros=filtros)
+    ultimos = ultimos.set_index("username")["ultima"] if not ultimos.empty else pd.Series(dtype="datetime64[ns]")
+
+    agenda = calcular_agenda(usuarios, ultimos)
+    agenda["atualizado_em"] = datetime.now()
+    agenda = agenda.astype(object).where(agenda.notna(), None)
+    upsert_rows(TABELA_AGENDA, agenda)
+    return len(agenda)
+
+@st.cache_resource
+def _agenda_inicial():
+    """Uma vez por processo: monta a agenda completa (ex: primeira subida, edições de outro servidor)."""
+    atualizar_agenda()
+    return True
+
+def agenda_do_paciente(username):
+    """Linha da agenda do paciente como dict (ou None se não for paciente)."""
+    _agenda_inicial()
+    df = consultar(TABELA_AGENDA, filtros={"username": username}, limite=1)
+    if df.empty:
+        atualizar_agenda([username])
+        df = consultar(TABELA_AGENDA, filtros={"username": username}, limite=1)
+        if df.empty: return None
+    linha = df.iloc[0].to_dict()
+    for c in ["ultimo_checkin", "liberado_em", "proximo_checkin"]:
+        linha[c] = linha[c].date() if pd.notnull(linha[c]) else None
+    return linha
+
+def deve_fazer_checkin(agenda, hoje=None):
+    """True se hoje é o dia do paciente e o check-in já está liberado."""
+    hoje = hoje or date.today()
+    if not agenda or agenda.get("proximo_checkin") is None or pd.isnull(agenda.get("dia_semana")):
+        return False
+    return int(agenda["dia_semana"]) == hoje.weekday() and agenda["proximo_checkin"] <= hoje
+
+def pendentes_de_hoje(hoje=None):
+    """Pacientes ativos que devem fazer check-in hoje (uma consulta filtrada)."""
+    _agenda_inicial()
+    hoje = hoje or date.today()
+    return consultar(TABELA_AGENDA, filtros={"ativo": True, "dia_semana": hoje.weekday(), "proximo_checkin__lte": hoje})
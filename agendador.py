@@ -0,0 +1,94 @@
+import time
+from datetime import date, datetime
+
+import streamlit as st
+
+import disparos
+from agenda import atualizar_agenda, pendentes_de_hoje
+from database import consultar
+
+# ===================================================
+# AGENDADOR DE LEMBRETES (RODA AO LADO DO SITE)
+# ===================================================
+# Processo separado, ligado pelo entrypoint.sh do Docker: python agendador.py
+# Todo dia, a partir de LEMBRETE_HORA, recalcula a agenda, monta o lote
+# "lembretes-AAAA-MM-DD" com quem deve check-in hoje e dispara pela Z-API.
+# O resultado fica em envios_whatsapp; o Painel Admin só lê o lote do dia.
+# Reiniciar no meio do dia é seguro: o lote do dia não é recriado e o disparo
+# retoma só o que ficou pendente.
+
+# Hora do servidor (se o container estiver em UTC, use 11 para 8h de Brasília)
+LEMBRETE_HORA = int(st.secrets.get("LEMBRETE_HORA", 8))
+LINK_PLATAFORMA = st.secrets.get("LINK_PLATAFORMA", "https://seu-app-nutricao.streamlit.app")
+INTERVALO_SEGUNDOS = 60
+
+def lote_do_dia(dia=None):
+    return f"lembretes-{(dia or date.today()).isoformat()}"
+
+def mensagem_lembrete(nome):
+    return f"Oi {nome}! Hoje é dia de check-in. Acesse: {LINK_PLATAFORMA}"
+
+def _so_digitos(tel):
+    return "".join(filter(str.isdigit, str(tel or "")))
+
+def enfileirar_lembretes(dia=None):
+    """
+    Cria o lote de lembretes do dia (uma mensagem por paciente com telefone).
+    Se o lote já existe, só devolve o código. Retorna None se não há ninguém.
+    """
+    dia = dia or date.today()
+    lote = lote_do_dia(dia)
+    if disparos.progresso_lote(lote):
+        return lote
+
+    pendentes = pendentes_de_hoje(dia)
+    if pendentes.empty:
+        return None
+    usuarios = consultar("usuarios", colunas=["username", "name", "telefone"],
+                         filtros={"username__in": pendentes["username"].tolist()})
+
+    destinatarios = []
+    for p in usuarios.to_dict("records"):
+        tel = _so_digitos(p.get("telefone"))
+        if tel:
+            destinatarios.append({"username": p["username"], "telefone": tel, "mensagem": mensagem_lembrete(p["name"])})
+    if not destinatarios:
+        return None
+
+    disparos.criar_lote(destinatarios, lote=lote)
+    # Se a tela e o agendador criaram ao mesmo tempo, um deles falha no índice único: vale o que ficou
+    return lote if disparos.progresso_lote(lote) else None
+
+def rodar_dia(dia=None):
+    """Rotina da manhã: agenda em dia, lote montado e enviado (espera terminar)."""
+    dia = dia or date.today()
+    atualizar_agenda()
+    lote = enfileirar_lembretes(dia)
+    if lote is None:
+        print(f"[agendador] {dia}: nenhum lembrete para enviar.", flush=True)
+        return None
+
+    instancia, token = disparos.credenciais_api()
+    if not instancia or not token:
+        print(f"[agendador] {dia}: Z-API não configurada, lote {lote} fica pendente.", flush=True)
+        return lote
+    disparos.disparar_lote(lote, instancia, token, esperar=True)
+    print(f"[agendador] {dia}: lote {lote} -> {disparos.progresso_lote(lote)}", flush=True)
+    return lote
+
+def main():
+    ultimo_dia = None
+    print(f"[agendador] iniciado, lembretes a partir das {LEMBRETE_HORA}h.", flush=True)
+    while True:
+        agora = datetime.now()
+        if agora.hour >= LEMBRETE_HORA and ultimo_dia != agora.date():
+            try:
+                rodar_dia(agora.date())
+                ultimo_dia = agora.date()
+            except Exception as e:
+                # Tenta de novo na próxima volta
+                print(f"[agendador] erro: {e}", flush=True)
+        time.sleep(INTERVALO_SEGUNDOS)
+
+if __name__ == "__main__":
+    main()
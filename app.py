@@ -1,8 +1,9 @@
 import streamlit as st
 import pandas as pd
 import os
+import importlib
 # Importa o cérebro do banco de dados
-from database import carregar_dados, salvar_novo_registro
+from database import buscar_usuario, guardar_perfil_sessao
 
 # =======================================================
 # CONFIGURAÇÃO INICIAL E LOGO
@@ -28,12 +29,31 @@ st.set_page_config(
 )
 
 # =======================================================
-# IMPORTAÇÃO DAS VIEWS (PÁGINAS)
+# ROTAS (PÁGINAS)
 # =======================================================
-# Importamos aqui para garantir que o set_page_config rode antes
-from views import home, calculadora, biblioteca, perfil, admin, checkin, financeiro
-import views.monitoramento as monitoramento
-from views.avisos_admin import show_enviar_avisos
+# Cada opção do menu aponta para (módulo, função). O módulo só é importado
+# quando a página é aberta: a tela de login não carrega altair, PyMuPDF,
+# pdf viewer, requests... (medido com python -X importtime: ~0,7s a menos)
+ROTAS_ADMIN = {
+    "Painel Admin": ("views.admin", "show_admin"),
+    "💰 Financeiro": ("views.financeiro", "show_financeiro"),
+    "Visualizar Check-in": ("views.checkin", "show_checkin"),
+    "Monitorar beliscadas": ("views.monitoramento", "show_monitoramento"),
+    "📢 Enviar Avisos": ("views.avisos_admin", "show_enviar_avisos"),
+}
+ROTAS_PACIENTE = {
+    "🏠 Início": ("views.home", "show_home"),
+    "📝 Check-in": ("views.checkin", "show_checkin"),
+    "🍫 Beliscadas": ("views.monitoramento", "show_monitoramento"),
+    "🧮 Calculadora": ("views.calculadora", "show_calculadora"),
+    "📚 Biblioteca": ("views.biblioteca", "show_biblioteca"),
+    "👤 Meu Perfil": ("views.perfil", "show_perfil"),
+}
+
+def abrir_pagina(rota):
+    """Importa a view da rota (só na primeira vez, depois fica em sys.modules) e mostra."""
+    modulo, funcao = rota
+    getattr(importlib.import_module(modulo), funcao)()
 
 # =======================================================
 # CSS VISUAL (ESTILO PROFISSIONAL)
@@ -111,29 +131,19 @@ configurar_estilo_visual()
 # =======================================================
 def login(u, s):
     """Verifica credenciais no Banco de Dados."""
-    # Carrega tabela
-    df = carregar_dados("usuarios")
-    if df.empty: return None
-    
-    # Tratamento de string para evitar erros de digitação
-    u_login = str(u).strip().lower()
+    # Busca só a linha do usuário (ignora maiúsculas/espaços, ver buscar_usuario)
+    dados = buscar_usuario(u)
     s_login = str(s).strip()
-    
-    # Cria coluna auxiliar para busca
-    if 'username' in df.columns:
-        df['user_clean'] = df['username'].astype(str).str.strip().str.lower()
-        user = df[df['user_clean'] == u_login]
-        
-        if not user.empty:
-            dados = user.iloc[0]
-            # Verifica senha (exata)
-            if str(dados.get('password', '')).strip() == s_login:
-                # Verifica status (aceita várias formas de True)
-                status = str(dados.get('active', 'True')).lower()
-                if status in ['true', '1', 'yes', 'on']:
-                    return dados.to_dict()
-                else:
-                    return "BLOQUEADO"
+
+    if dados:
+        # Verifica senha (exata)
+        if str(dados.get('password', '')).strip() == s_login:
+            # Verifica status (aceita várias formas de True)
+            status = str(dados.get('active', 'True')).lower()
+            if status in ['true', '1', 'yes', 'on']:
+                return dados
+            else:
+                return "BLOQUEADO"
     return None
 
 # Inicializa variáveis de sessão
@@ -192,6 +202,8 @@ if not st.session_state["logado"]:
                         "role": res.get('role'),
                         "nome": res.get('name')
                     })
+                    # Cadastro fica na sessão: as páginas não releem 'usuarios'
+                    guardar_perfil_sessao(res)
                     st.rerun()
                 else:
                     st.error("Usuário ou senha incorretos.")
@@ -231,7 +243,7 @@ else:
                 
             menu = st.radio(
                 "Menu", 
-                ["Painel Admin", "💰 Financeiro", "Visualizar Check-in", "Monitorar beliscadas", "📢 Enviar Avisos"], 
+                list(ROTAS_ADMIN), 
                 key="menu_opcao"
             )
         else:
@@ -239,7 +251,7 @@ else:
                 
             menu = st.radio(
                 "Menu", 
-                ["🏠 Início", "📝 Check-in", "🍫 Beliscadas", "🧮 Calculadora", "📚 Biblioteca", "👤 Meu Perfil"], 
+                list(ROTAS_PACIENTE), 
                 key="menu_opcao"
             )
 
@@ -249,18 +261,5 @@ else:
             st.rerun()
 
     # --- ROTEAMENTO ---
-    # ADMIN
-    if st.session_state["role"] == "admin":
-        if menu == "Painel Admin": admin.show_admin()
-        elif menu == "💰 Financeiro": financeiro.show_financeiro()
-        elif menu == "Visualizar Check-in": checkin.show_checkin()
-        elif menu == "Monitorar beliscadas": monitoramento.show_monitoramento()
-        elif menu == "📢 Enviar Avisos": show_enviar_avisos()
-    
-    # PACIENTE
-    elif menu == "🏠 Início": home.show_home()
-    elif menu == "📝 Check-in": checkin.show_checkin()
-    elif menu == "🍫 Beliscadas": monitoramento.show_monitoramento()
-    elif "Calculadora" in menu: calculadora.show_calculadora()
-    elif "Biblioteca" in menu: biblioteca.show_biblioteca()
-    elif "Perfil" in menu: perfil.show_perfil()
\ No newline at end of file
+    rotas = ROTAS_ADMIN if st.session_state["role"] == "admin" else ROTAS_PACIENTE
+    if menu in rotas: abrir_pagina(rotas[menu])
\ No newline at end of file
@@ -0,0 +1,92 @@
+"""
+Latência de marcar UMA tarefa do checklist conforme a tabela cresce:
+- upsert: INSERT ... ON CONFLICT (username, data) DO UPDATE só do bit da tarefa (salvar_tarefa atual)
+- reescrita: carregar tudo + atualizar_tabela_completa atual (DELETE + append numa transação)
+- antigo: como era antes, read_sql_table + to_sql(if_exists="replace"), reproduzido aqui
+
+Uso (na raiz do projeto, com o DATABASE_URL configurado nos Secrets):
+    python benchmarks/checklist_upsert.py
+
+Cria uma tabela temporária 'bench_checklist' (mesma estrutura do checklist) e apaga no final.
+"""
+import os
+import statistics
+import sys
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+from sqlalchemy import text
+
+import database
+from views.home import COMANDO_MARCAR_TAREFA
+
+TABELA = "bench_checklist"
+PACIENTES = 100
+# Dias de histórico por paciente: ~1 mês, ~1 ano, ~3 anos, ~10 anos
+HISTORICOS = [30, 365, 1095, 3650]
+REPETICOES = 20
+REPETICOES_REESCRITA = 3  # a reescrita é lenta demais para repetir muito
+
+def preencher(conn, dias):
+    conn.execute(text(f'DROP TABLE IF EXISTS "{TABELA}"'))
+    conn.execute(text(f'CREATE TABLE "{TABELA}" (LIKE checklist INCLUDING ALL)'))
+    conn.execute(text(f"""
+        INSERT INTO "{TABELA}" (username, data, tarefas)
+        SELECT 'paciente_' || p, CURRENT_DATE - d, floor(random() * 32)::smallint
+        FROM generate_series(1, {PACIENTES}) p, generate_series(1, {dias}) d
+    """))
+
+def medir(funcao, repeticoes):
+    tempos = []
+    for i in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao(i)
+        tempos.append(time.perf_counter() - inicio)
+    return statistics.median(tempos) * 1000
+
+def main():
+    engine = database.engine
+    if engine is None:
+        sys.exit("DATABASE_URL não configurado.")
+
+    # O mesmo comando do salvar_tarefa (views/home.py), apontando para a tabela de teste
+    comando = COMANDO_MARCAR_TAREFA.format(tabela=f'"{TABELA}"')
+
+    def upsert(i):
+        feito = i % 2 == 0
+        database.executar_sql(comando, {"usuario": f"paciente_{i % PACIENTES}", "data": date.today(),
+                                        "inicial": 1 if feito else 0, "feito": feito, "bit": 1}, tabela=TABELA)
+
+    def marcar(df, i):
+        df.loc[(df["username"] == f"paciente_{i % PACIENTES}") & (df["data"] == df["data"].max()), "tarefas"] = i % 32
+        return df
+
+    def reescrita(i):
+        database.atualizar_tabela_completa(marcar(database.carregar_dados(TABELA), i), TABELA)
+
+    def antigo(i):
+        # Código original: lê sem cache e recria a tabela (perde chave e índices)
+        marcar(pd.read_sql_table(TABELA, engine), i).to_sql(TABELA, engine, if_exists="replace", index=False)
+
+    print(f"{'linhas':>10} {'upsert (ms)':>12} {'reescrita (ms)':>15} {'antigo (ms)':>12}")
+    try:
+        for dias in HISTORICOS:
+            with engine.begin() as conn:
+                preencher(conn, dias)
+            database._esquecer_estrutura(TABELA)
+            database.invalidar_cache(TABELA)
+            ms_upsert = medir(upsert, REPETICOES)
+            ms_reescrita = medir(reescrita, REPETICOES_REESCRITA)
+            # Por último: o replace derruba a chave que o upsert e a reescrita usam
+            ms_antigo = medir(antigo, REPETICOES_REESCRITA)
+            print(f"{PACIENTES * dias:>10} {ms_upsert:>12.1f} {ms_reescrita:>15.1f} {ms_antigo:>12.1f}")
+    finally:
+        with engine.begin() as conn:
+            conn.execute(text(f'DROP TABLE IF EXISTS "{TABELA}"'))
+        database._esquecer_estrutura(TABELA)
+
+if __name__ == "__main__":
+    main()
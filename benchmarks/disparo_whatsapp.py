@@ -0,0 +1,93 @@
+"""
+Servidor local que imita o endpoint send-text da Z-API, e um teste de carga
+do disparo (disparos.py) contra ele.
+
+Só o servidor (para testar a tela, com ZAPI_URL_BASE = "http://127.0.0.1:8765" nos Secrets):
+    python benchmarks/disparo_whatsapp.py --servidor
+
+Disparo de teste (na raiz do projeto, com o DATABASE_URL configurado nos Secrets):
+    python benchmarks/disparo_whatsapp.py [mensagens] [taxa_de_erro]
+
+As mensagens de teste são apagadas de 'envios_whatsapp' no final.
+"""
+import json
+import os
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PORTA = 8765
+LATENCIA = 0.3      # segundos por requisição, parecido com a API real
+TAXA_DE_ERRO = 0.1  # fração das requisições que devolve 500 (testa as novas tentativas)
+
+class ZapiFalsa(BaseHTTPRequestHandler):
+    recebidas = []
+
+    def do_POST(self):
+        partes = self.path.strip("/").split("/")
+        # /instances/{instancia}/token/{token}/send-text
+        if len(partes) != 5 or partes[0] != "instances" or partes[2] != "token" or partes[4] != "send-text":
+            return self._responder(404, {"error": "NOT_FOUND"})
+        corpo = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if not corpo.get("phone") or not corpo.get("message"):
+            return self._responder(400, {"error": "phone e message são obrigatórios"})
+        time.sleep(LATENCIA)
+        if random.random() < TAXA_DE_ERRO:
+            return self._responder(500, {"error": "INTERNAL_ERROR"})
+        ZapiFalsa.recebidas.append(corpo["phone"])
+        codigo = f"{random.getrandbits(64):016X}"
+        self._responder(200, {"zaapId": codigo, "messageId": codigo, "id": codigo})
+
+    def _responder(self, status, corpo):
+        dados = json.dumps(corpo).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(dados)))
+        self.end_headers()
+        self.wfile.write(dados)
+
+    def log_message(self, *args):
+        pass
+
+def iniciar_servidor():
+    servidor = ThreadingHTTPServer(("127.0.0.1", PORTA), ZapiFalsa)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor
+
+def main():
+    global TAXA_DE_ERRO
+    if "--servidor" in sys.argv:
+        print(f"Z-API local em http://127.0.0.1:{PORTA}")
+        ThreadingHTTPServer(("127.0.0.1", PORTA), ZapiFalsa).serve_forever()
+        return
+
+    quantidade = int(sys.argv[1]) if len(sys.argv) > 1 else 60
+    if len(sys.argv) > 2:
+        TAXA_DE_ERRO = float(sys.argv[2])
+
+    import disparos
+    from database import delete_rows
+
+    servidor = iniciar_servidor()
+    destinatarios = [{"username": f"bench_{i}", "telefone": f"1199999{i:04d}", "mensagem": "Teste de disparo"}
+                     for i in range(quantidade)]
+    lote = disparos.criar_lote(destinatarios)
+    try:
+        inicio = time.perf_counter()
+        disparos.disparar_lote(lote, "instancia", "token", url_base=f"http://127.0.0.1:{PORTA}", esperar=True)
+        segundos = time.perf_counter() - inicio
+        print(f"{quantidade} mensagens em {segundos:.1f}s "
+              f"({disparos.DISPARO_TRABALHADORES} threads, até {disparos.DISPARO_POR_SEGUNDO:g}/s, "
+              f"latência {LATENCIA}s, erro {TAXA_DE_ERRO:.0%})")
+        print("Status:", disparos.progresso_lote(lote))
+        print("Recebidas pelo servidor:", len(ZapiFalsa.recebidas))
+    finally:
+        delete_rows(disparos.TABELA_ENVIOS, {"lote": lote})
+        servidor.shutdown()
+
+if __name__ == "__main__":
+    main()
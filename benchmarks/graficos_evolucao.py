@@ -0,0 +1,50 @@
+"""
+Tamanho do gráfico de evolução enviado ao navegador conforme o histórico cresce:
+- completo: um ponto por check-in (como era o plot_evolucao antigo)
+- reduzido: graficos.spec_evolucao (médias por período + LTTB, no máximo PONTOS_MAXIMOS)
+
+Uso (na raiz do projeto):
+    python benchmarks/graficos_evolucao.py
+
+Não usa o banco: as séries de peso são geradas em memória.
+"""
+import json
+import os
+import sys
+import time
+
+import altair as alt
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from graficos import spec_evolucao
+
+# Check-ins de um paciente (semanal: 1 ano, 2 anos, 5 anos) e de uma turma inteira
+HISTORICOS = [52, 104, 260, 5000, 50000]
+
+def gerar_pesos(n):
+    rng = np.random.default_rng(7)
+    datas = pd.Timestamp("2020-01-06") + pd.to_timedelta(np.sort(rng.integers(0, min(7 * n, 5 * 365), n)), unit="D")
+    pesos = 95 - np.linspace(0, 15, n) + rng.normal(0, 1.2, n)
+    return pd.Series(datas), pd.Series(pesos.round(1))
+
+def spec_completo(datas, valores):
+    df = pd.DataFrame({"data": datas, "valor": valores})
+    base = alt.Chart(df).encode(x="data:T", y=alt.Y("valor:Q", scale=alt.Scale(domain=[40, 150])))
+    return (base.mark_line(strokeWidth=3) + base.mark_circle(size=80)).interactive().to_dict()
+
+def medir(funcao, *args):
+    inicio = time.perf_counter()
+    spec = funcao(*args)
+    return (time.perf_counter() - inicio) * 1000, len(json.dumps(spec, default=str))
+
+if __name__ == "__main__":
+    alt.data_transformers.disable_max_rows()
+    print(f"{'check-ins':>10} | {'completo (ms / KB)':>20} | {'reduzido (ms / KB)':>20}")
+    for n in HISTORICOS:
+        datas, pesos = gerar_pesos(n)
+        t_completo, b_completo = medir(spec_completo, datas, pesos)
+        t_reduzido, b_reduzido = medir(spec_evolucao, datas, pesos, "#FF4B4B", [40, 150])
+        print(f"{n:>10} | {t_completo:8.1f} / {b_completo / 1024:8.1f} | {t_reduzido:8.1f} / {b_reduzido / 1024:8.1f}")
@@ -0,0 +1,73 @@
+"""
+Compara a leitura normal (pd.read_sql, dtypes numpy/object) com o modo
+formato="arrow" (COPY + pyarrow) numa tabela larga parecida com checkins.
+
+Uso (na raiz do projeto, com o DATABASE_URL configurado nos Secrets):
+    python benchmarks/leitura_arrow.py [linhas]
+
+Cria uma tabela temporária 'bench_leitura', mede e apaga no final.
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+from sqlalchemy import text, select
+
+import database
+
+LINHAS = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+REPETICOES = 5
+TABELA = "bench_leitura"
+
+# ~30 colunas: mesma mistura de tipos do checkins (muito texto, alguns números)
+NUMERICAS = ["peso", "refeicoes_fora", "dias_alcool", "treino_forca", "treino_cardio", "sono_horas", "avaliacao_atend"]
+TEXTOS = [f"resposta_{i}" for i in range(20)]
+
+def criar_tabela(conn):
+    colunas = ["g AS id", "'paciente_' || (g % 300) AS username", "DATE '2024-01-01' + (g % 700) AS data"]
+    colunas += [f"round((random() * 100)::numeric, 1)::double precision AS {c}" for c in NUMERICAS]
+    colunas += [f"md5((g + {i})::text) AS {c}" for i, c in enumerate(TEXTOS)]
+    conn.execute(text(f'DROP TABLE IF EXISTS "{TABELA}"'))
+    conn.execute(text(f'CREATE TABLE "{TABELA}" AS SELECT {", ".join(colunas)} FROM generate_series(1, {LINHAS}) g'))
+
+def medir(ler):
+    tempos = []
+    for _ in range(REPETICOES):
+        inicio = time.perf_counter()
+        df = ler()
+        tempos.append(time.perf_counter() - inicio)
+    return min(tempos), df.memory_usage(deep=True).sum() / 2**20
+
+def main():
+    engine = database.engine
+    if engine is None:
+        sys.exit("DATABASE_URL não configurado.")
+
+    with engine.begin() as conn:
+        criar_tabela(conn)
+    try:
+        tb = database._obter_tabela(TABELA)
+        consulta = select(tb)
+
+        def ler_normal():
+            with engine.connect() as conn:
+                return pd.read_sql(consulta, conn, parse_dates=["data"])
+
+        def ler_arrow():
+            with engine.connect() as conn:
+                return database._ler_arrow(conn, consulta)
+
+        print(f"{LINHAS} linhas x {len(tb.c)} colunas (melhor de {REPETICOES})")
+        for nome, ler in [("read_sql", ler_normal), ("arrow", ler_arrow)]:
+            segundos, mb = medir(ler)
+            print(f"  {nome:<10} {segundos * 1000:8.1f} ms  {mb:8.1f} MB")
+    finally:
+        with engine.begin() as conn:
+            conn.execute(text(f'DROP TABLE IF EXISTS "{TABELA}"'))
+        database._esquecer_estrutura(TABELA)
+
+if __name__ == "__main__":
+    main()
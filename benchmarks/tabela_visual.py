@@ -0,0 +1,86 @@
+"""
+Tempo para montar a tabela de semáforos (Histórico do Painel Admin) com 10 mil check-ins:
+- vetorizado: gerar_tabela_visual atual (np.select por coluna)
+- apply: a versão antiga, uma função Python (try/float) por célula
+
+Uso (na raiz do projeto, com os Secrets configurados):
+    python benchmarks/tabela_visual.py
+
+Não usa o banco: os check-ins são gerados em memória.
+"""
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from views.admin import gerar_tabela_visual
+
+CHECKINS = 10_000
+PACIENTES = 200
+REPETICOES = 20
+
+def gerar_tabela_visual_apply(df):
+    """Implementação antiga, mantida aqui só para comparação."""
+    df_view = pd.DataFrame()
+    df_view['Data'] = df['data_visual']
+    if 'peso' in df.columns: df_view['Peso'] = df['peso']
+
+    def get_icon(val, invertido=False):
+        try: val = float(val)
+        except: return "⚪"
+        if val >= 75: return "🟢"
+        if val >= 50: return "😐"
+        return "🔴"
+
+    df_view['Aderência'] = df['score_aderencia'].apply(lambda x: get_icon(x))
+    df_view['Dedicação'] = df['score_dedicacao'].apply(lambda x: get_icon(x))
+    df_view['Sono'] = df['score_sono'].apply(lambda x: get_icon(x))
+    df_view['Rotina'] = df['score_rotina'].apply(lambda x: get_icon(x))
+    df_view['Disposição'] = df['score_disposicao'].apply(lambda x: get_icon(x))
+    df_view['Furos'] = df['refeicoes_fora'].apply(lambda x: "🟢" if x <= 2 else ("😐" if x <= 4 else "🔴"))
+    df_view['Álcool'] = df['dias_alcool'].apply(lambda x: "🟢" if x == 0 else ("😐" if x <= 2 else "🔴"))
+    df_view['Treino'] = df['treino_forca'].apply(lambda x: "🟢" if x >= 3 else ("😐" if x >= 1 else "🔴"))
+    df_view['Nota'] = df['nota_geral'].apply(lambda x: f"{x:.0f}")
+    return df_view
+
+def gerar_checkins(n):
+    rng = np.random.default_rng(42)
+    notas = [0, 25, 40, 50, 75, 100]
+    df = pd.DataFrame({
+        "username": rng.integers(0, PACIENTES, n).astype(str),
+        "data_visual": pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 700, n), unit="D"),
+        "peso": rng.normal(80, 12, n).round(1),
+        "refeicoes_fora": rng.integers(0, 8, n).astype(float),
+        "dias_alcool": rng.integers(0, 5, n).astype(float),
+        "treino_forca": rng.integers(0, 6, n).astype(float),
+    })
+    for coluna in ["score_aderencia", "score_dedicacao", "score_sono", "score_rotina", "score_disposicao"]:
+        df[coluna] = rng.choice(notas, n)
+    df["nota_geral"] = (df["score_aderencia"] + df["score_dedicacao"]) / 2
+    df["data_visual"] = df["data_visual"].dt.strftime("%d/%m")
+    return df
+
+def medir(funcao, df):
+    tempos = []
+    for _ in range(REPETICOES):
+        inicio = time.perf_counter()
+        funcao(df)
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tempos)
+
+if __name__ == "__main__":
+    df = gerar_checkins(CHECKINS)
+
+    # As duas precisam dar exatamente o mesmo resultado
+    pd.testing.assert_frame_equal(gerar_tabela_visual(df).reset_index(drop=True), gerar_tabela_visual_apply(df))
+
+    vetorizado = medir(gerar_tabela_visual, df)
+    antigo = medir(gerar_tabela_visual_apply, df)
+    print(f"{CHECKINS} check-ins, mediana de {REPETICOES} execuções")
+    print(f"  apply (antigo): {antigo:8.1f} ms")
+    print(f"  vetorizado:     {vetorizado:8.1f} ms  ({antigo / vetorizado:.0f}x mais rápido)")
@@ -1,6 +1,19 @@
 import streamlit as st
 import pandas as pd
-from sqlalchemy import create_engine, text
+import numpy as np
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import io
+import os
+import threading
+import time
+from collections import OrderedDict
+from sqlalchemy import create_engine, text, MetaData, Table, select, func, tuple_
+from sqlalchemy.exc import NoSuchTableError, ProgrammingError
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.types import Date, DateTime, Time, Boolean, Integer, Float
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+import schema
 
 # ===================================================
 # 1. CONFIGURAÇÃO DA CONEXÃO
@@ -29,64 +42,718 @@ def get_db_engine():
 # Inicializa o motor usando o cache (Isso é o que deixa rápido!)
 engine = get_db_engine()
 
+@st.cache_resource
+def preparar_banco(_engine):
+    """Aplica o esquema de schema.py UMA VEZ por processo (tipos, chaves e índices)."""
+    schema.migrar(_engine)
+    return True
+
+if engine is not None:
+    preparar_banco(engine)
+
 # ===================================================
-# 2. FUNÇÕES DE LEITURA E ESCRITA
+# 2. CACHE DE LEITURA (COMPARTILHADO ENTRE SESSÕES)
 # ===================================================
+# Cada tabela tem um número de versão que sobe a cada escrita feita por este
+# processo. Leituras ficam guardadas em memória até expirar o TTL ou até a
+# próxima escrita na tabela, o que acontecer primeiro.
+CACHE_TTL_SEGUNDOS = float(st.secrets.get("CACHE_TTL_SEGUNDOS", 60))
+CACHE_MAX_ENTRADAS = int(st.secrets.get("CACHE_MAX_ENTRADAS", 64))
+
+_cache = OrderedDict()  # chave -> (tabela, versao, momento, DataFrame)
+_versoes = {}           # tabela -> versão atual
+_estatisticas = {"hits": 0, "misses": 0, "invalidacoes": 0}
+_trava_cache = threading.Lock()
+
+def versao_tabela(tabela):
+    """Retorna a versão atual da tabela (muda a cada escrita)."""
+    with _trava_cache:
+        return _versoes.get(tabela, 0)
 
-def carregar_dados(tabela):
+def _ler_cache(chave):
+    """Devolve uma CÓPIA do DataFrame guardado, ou None se não houver/expirou."""
+    with _trava_cache:
+        item = _cache.get(chave)
+        if item is not None:
+            tabela, versao, momento, df = item
+            valido = (
+                versao == _versoes.get(tabela, 0)
+                and time.monotonic() - momento < CACHE_TTL_SEGUNDOS
+            )
+            if valido:
+                _cache.move_to_end(chave)
+                _estatisticas["hits"] += 1
+                # Cópia: as views alteram os DataFrames que recebem
+                return df.copy()
+            del _cache[chave]
+        _estatisticas["misses"] += 1
+        return None
+
+def _gravar_cache(chave, tabela, versao, df):
+    """Guarda o resultado, desde que ninguém tenha escrito na tabela durante a leitura."""
+    if CACHE_TTL_SEGUNDOS <= 0 or CACHE_MAX_ENTRADAS <= 0:
+        return
+    with _trava_cache:
+        if versao != _versoes.get(tabela, 0):
+            return
+        _cache[chave] = (tabela, versao, time.monotonic(), df.copy())
+        _cache.move_to_end(chave)
+        # Remove os itens usados há mais tempo quando passa do limite
+        while len(_cache) > CACHE_MAX_ENTRADAS:
+            _cache.popitem(last=False)
+
+def invalidar_cache(tabela=None):
+    """
+    Descarta o cache de uma tabela (ou de todas, se tabela=None).
+    Chamado automaticamente pelas funções de escrita deste módulo.
+    """
+    with _trava_cache:
+        if tabela is None:
+            tabelas = {item[0] for item in _cache.values()} | set(_versoes)
+        else:
+            tabelas = {tabela}
+        for t in tabelas:
+            _versoes[t] = _versoes.get(t, 0) + 1
+        for chave in [c for c, item in _cache.items() if item[0] in tabelas]:
+            del _cache[chave]
+        _estatisticas["invalidacoes"] += 1
+
+def estatisticas_cache():
+    """Contadores do cache para diagnóstico (hits, misses, taxa de acerto...)."""
+    with _trava_cache:
+        total = _estatisticas["hits"] + _estatisticas["misses"]
+        return {
+            **_estatisticas,
+            "entradas": len(_cache),
+            "taxa_acerto": _estatisticas["hits"] / total if total else 0.0,
+        }
+
+# ===================================================
+# 3. FUNÇÕES DE LEITURA E ESCRITA
+# ===================================================
+
+def carregar_dados(tabela, formato=None):
     """
     Lê uma tabela inteira do banco de dados e retorna como DataFrame.
     Se a tabela não existir (primeiro uso), retorna um DataFrame vazio.
+    O resultado passa pelo cache em memória (ver seção 2).
+    formato="arrow" devolve colunas Arrow (ver consultar).
     """
-    if engine is None: 
+    # Mesmo caminho do consultar(), sem filtros: a estrutura da tabela já
+    # está em memória, então é uma única ida ao banco (e nenhuma com cache)
+    return consultar(tabela, formato=formato)
+
+# Operadores aceitos nos filtros de consultar(): {"coluna__operador": valor}
+_OPERADORES = {
+    "eq": lambda col, v: col == v,
+    "ne": lambda col, v: col != v,
+    "lt": lambda col, v: col < v,
+    "lte": lambda col, v: col <= v,
+    "gt": lambda col, v: col > v,
+    "gte": lambda col, v: col >= v,
+    "in": lambda col, v: col.in_(list(v)),
+}
+
+# Estrutura das tabelas (colunas e tipos) refletida UMA VEZ por processo.
+# Só é descartada quando uma escrita cria a tabela/colunas ou uma leitura falha.
+_estruturas = {}  # tabela -> (Table ou None se não existe, momento)
+_trava_estruturas = threading.Lock()
+
+def _obter_tabela(tabela, conn=None):
+    """
+    Estrutura (colunas e tipos) da tabela. None se ela não existir.
+    Com `conn` (dentro de uma transação de escrita) reflete na hora, sem cache,
+    para enxergar colunas recém-criadas que ainda não foram confirmadas.
+    """
+    if conn is None:
+        with _trava_estruturas:
+            item = _estruturas.get(tabela)
+        # "Não existe" também fica guardado, mas só pelo TTL: outro processo pode criá-la
+        if item is not None and (item[0] is not None or time.monotonic() - item[1] < CACHE_TTL_SEGUNDOS):
+            return item[0]
+
+    try:
+        tb = Table(tabela, MetaData(), autoload_with=conn if conn is not None else engine)
+    except NoSuchTableError:
+        tb = None
+
+    if conn is None:
+        with _trava_estruturas:
+            _estruturas[tabela] = (tb, time.monotonic())
+    return tb
+
+def _esquecer_estrutura(tabela):
+    """Descarta a estrutura guardada (próximo acesso reflete de novo)."""
+    with _trava_estruturas:
+        _estruturas.pop(tabela, None)
+
+def _muda_estrutura(tabela, colunas):
+    """True se gravar estas colunas vai criar a tabela ou alguma coluna nova."""
+    tb = _obter_tabela(tabela)
+    return tb is None or any(c not in tb.c for c in colunas)
+
+def _montar_condicoes(tb, filtros):
+    """
+    Converte o dicionário de filtros em condições SQL com parâmetros (bind).
+    Ex: {"username": "ana", "data__gte": "2025-01-01", "status__in": ["Pendente"]}
+    Levanta KeyError se alguma coluna não existir na tabela.
+    """
+    condicoes = []
+    for chave, valor in (filtros or {}).items():
+        nome_coluna, _, operador = chave.partition("__")
+        operador = operador or "eq"
+        if nome_coluna not in tb.c:
+            raise KeyError(f"coluna '{nome_coluna}' não existe em '{tb.name}'")
+        if operador not in _OPERADORES:
+            raise ValueError(f"operador desconhecido: '{operador}'")
+        condicoes.append(_OPERADORES[operador](tb.c[nome_coluna], valor))
+    return condicoes
+
+# Tipo Arrow de cada coluna no modo formato="arrow" (o resto vira string)
+_TIPOS_ARROW = [
+    (DateTime, pa.timestamp("us")),
+    (Date, pa.timestamp("s")),  # data vira timestamp, como o parse_dates do modo normal
+    (Time, pa.time64("us")),
+    (Boolean, pa.bool_()),
+    (Integer, pa.int64()),
+    (Float, pa.float64()),
+]
+
+def _tipo_arrow(tipo):
+    for classe, tipo_arrow in _TIPOS_ARROW:
+        if isinstance(tipo, classe):
+            return tipo_arrow
+    return pa.string()
+
+def _ler_arrow(conn, consulta):
+    """
+    Executa a consulta com COPY ... TO STDOUT (CSV) e decodifica direto em
+    colunas Arrow, sem montar uma tupla Python por linha.
+    O CSV não fica inteiro na memória: uma thread escreve o COPY num pipe e o
+    leitor do pyarrow converte bloco a bloco enquanto ele chega.
+    Retorna DataFrame com dtypes pyarrow (igual a dtype_backend='pyarrow').
+    """
+    compilada = consulta.compile(dialect=conn.dialect, compile_kwargs={"render_postcompile": True})
+    cursor = conn.connection.cursor()
+    sql = cursor.mogrify(str(compilada), compilada.params).decode()
+
+    colunas = consulta.selected_columns
+    opcoes = pa_csv.ConvertOptions(
+        column_types={c.name: _tipo_arrow(c.type) for c in colunas},
+        # No CSV do Postgres: vazio sem aspas = NULL, "" = texto vazio
+        strings_can_be_null=True,
+        quoted_strings_can_be_null=False,
+        true_values=["t"],
+        false_values=["f"],
+    )
+
+    leitura, escrita = os.pipe()
+    erros = []
+
+    def copiar():
+        try:
+            with os.fdopen(escrita, "wb") as saida:
+                cursor.copy_expert(f"COPY ({sql}) TO STDOUT WITH (FORMAT csv, HEADER)", saida)
+        except Exception as e:
+            erros.append(e)
+
+    produtor = threading.Thread(target=copiar, daemon=True)
+    produtor.start()
+    try:
+        # Fechar a leitura (fim do with) também destrava o COPY se a conversão falhar
+        with os.fdopen(leitura, "rb") as entrada:
+            tabela_arrow = pa_csv.open_csv(entrada, convert_options=opcoes).read_all()
+    except Exception:
+        produtor.join()
+        # O erro do banco explica melhor que "CSV vazio"; pipe quebrado é só efeito da falha aqui
+        if erros and not isinstance(erros[0], BrokenPipeError): raise erros[0]
+        raise
+    produtor.join()
+    if erros: raise erros[0]
+    return tabela_arrow.to_pandas(types_mapper=pd.ArrowDtype)
+
+def _congelar(valor):
+    """Transforma filtros/listas em tuplas para servirem de chave no cache."""
+    if isinstance(valor, dict):
+        return tuple(sorted((k, _congelar(v)) for k, v in valor.items()))
+    if isinstance(valor, (list, tuple, set)):
+        return tuple(_congelar(v) for v in valor)
+    return valor
+
+def consultar(tabela, colunas=None, filtros=None, ordem=None, limite=None, formato=None, usar_cache=True, apos=None):
+    """
+    Lê apenas as linhas/colunas necessárias, com o filtro feito pelo Postgres.
+    - colunas: lista de colunas (None = todas)
+    - filtros: {"coluna": valor} ou {"coluna__op": valor}, op em eq, ne, lt, lte, gt, gte, in
+    - ordem: lista de colunas; prefixo "-" ordena decrescente (ex: ["-data"])
+    - limite: número máximo de linhas
+    - formato: "arrow" devolve colunas Arrow (COPY + pyarrow, menos memória e
+      decodificação mais rápida em leituras grandes); None = dtypes numpy de sempre
+    - usar_cache: False para consultas que mudam a cada chamada (ex: filtro com
+      o horário atual) e não devem ocupar espaço no cache
+    - apos: {"coluna": valor, ...} só as linhas DEPOIS desta chave, comparando as
+      colunas em conjunto (paginação por chave; use ordem nas mesmas colunas)
+      Ex: ordem=["data", "username"], apos={"data": ultima_data, "username": ultimo_user}
+    Assim como carregar_dados, retorna DataFrame vazio se a tabela não existir
+    e o resultado também passa pelo cache (invalidado nas escritas).
+    """
+    if engine is None:
         return pd.DataFrame()
-    
+
+    chave = ("consulta", tabela, _congelar(colunas), _congelar(filtros), _congelar(ordem), limite, formato, tuple(apos.items()) if apos else None)
+    em_cache = _ler_cache(chave) if usar_cache else None
+    if em_cache is not None:
+        return em_cache
+
+    versao = versao_tabela(tabela)
     try:
-        # Abre uma conexão rápida apenas para verificar se a tabela existe
-        with engine.connect() as conn:
-            # Comando específico do PostgreSQL para checar existência de tabela
-            verificacao = text(f"SELECT to_regclass('public.{tabela}')")
-            if conn.execute(verificacao).scalar() is None:
-                return pd.DataFrame() # Tabela não existe, retorna vazio
-            
-        # Se existe, lê tudo
-        return pd.read_sql_table(tabela, engine)
-    
+        tb = _obter_tabela(tabela)
+        if tb is None:
+            df = pd.DataFrame()
+        else:
+            # Colunas que não existem são ignoradas (mesmo comportamento defensivo das views)
+            if colunas:
+                selecionadas = [tb.c[c] for c in colunas if c in tb.c]
+            else:
+                selecionadas = [c for c in tb.c if c.name not in schema.colunas_geradas(tabela)]
+            consulta = select(*selecionadas).where(*_montar_condicoes(tb, filtros))
+            if apos:
+                consulta = consulta.where(tuple_(*[tb.c[c] for c in apos]) > tuple_(*apos.values()))
+            for c in ordem or []:
+                coluna = tb.c[c.lstrip("-")]
+                consulta = consulta.order_by(coluna.desc() if c.startswith("-") else coluna.asc())
+            if limite is not None:
+                consulta = consulta.limit(limite)
+            # Datas voltam como datetime64, igual ao read_sql_table do carregar_dados
+            datas = [c.name for c in consulta.selected_columns if isinstance(c.type, (Date, DateTime))]
+            with engine.connect() as conn:
+                if formato == "arrow" and conn.dialect.driver == "psycopg2":
+                    df = _ler_arrow(conn, consulta)
+                else:
+                    df = pd.read_sql(consulta, conn, parse_dates=datas)
+
+    except KeyError as e:
+        # Filtro/ordem em coluna que a tabela ainda não tem: nenhuma linha pode bater
+        print(f"Consulta em '{tabela}' ignorada: {e}")
+        df = pd.DataFrame()
     except Exception as e:
-        # Se der erro (ex: conexão caiu), retorna vazio para não travar o site
+        # Se der erro (ex: conexão caiu), retorna vazio para não travar o site.
+        # A estrutura guardada pode estar velha (tabela alterada por fora): reflete de novo na próxima.
         print(f"Erro silencioso ao ler '{tabela}': {e}") # Log no terminal
+        _esquecer_estrutura(tabela)
         return pd.DataFrame()
 
+    if usar_cache:
+        _gravar_cache(chave, tabela, versao, df)
+    return df
+
+# Funções de agregação aceitas em agregar()
+_AGREGACOES = {"max": func.max, "min": func.min, "sum": func.sum, "avg": func.avg, "count": func.count}
+
+def agregar(tabela, por, funcoes, filtros=None, usar_cache=True):
+    """
+    GROUP BY feito pelo Postgres: uma linha por grupo, em uma ida ao banco.
+    - por: lista de colunas do agrupamento
+    - funcoes: {"nome_resultado": ("max", "coluna")}, funções em max, min, sum, avg, count
+    - filtros: mesmo formato de consultar()
+    Ex: agregar("checkins", ["username"], {"ultima": ("max", "data")})
+    - usar_cache: False quando outro processo também grava na tabela (ex: agendador)
+    Retorna DataFrame vazio se a tabela/coluna não existir. Passa pelo cache.
+    """
+    if engine is None:
+        return pd.DataFrame()
+
+    chave = ("agregado", tabela, _congelar(por), _congelar(funcoes), _congelar(filtros))
+    em_cache = _ler_cache(chave) if usar_cache else None
+    if em_cache is not None:
+        return em_cache
+
+    versao = versao_tabela(tabela)
+    try:
+        tb = _obter_tabela(tabela)
+        if tb is None:
+            df = pd.DataFrame()
+        else:
+            grupos = [tb.c[c] for c in por]
+            calculos = [_AGREGACOES[f](tb.c[c]).label(nome) for nome, (f, c) in funcoes.items()]
+            consulta = select(*grupos, *calculos).where(*_montar_condicoes(tb, filtros)).group_by(*grupos)
+            datas = [c.name for c in consulta.selected_columns if isinstance(c.type, (Date, DateTime))]
+            with engine.connect() as conn:
+                df = pd.read_sql(consulta, conn, parse_dates=datas)
+
+    except KeyError as e:
+        print(f"Agregação em '{tabela}' ignorada: {e}")
+        df = pd.DataFrame()
+    except Exception as e:
+        print(f"Erro silencioso ao agregar '{tabela}': {e}")
+        _esquecer_estrutura(tabela)
+        return pd.DataFrame()
+
+    if usar_cache:
+        _gravar_cache(chave, tabela, versao, df)
+    return df
+
+def ler_sql(sql, parametros=None):
+    """
+    SELECT escrito à mão, para leituras que consultar/agregar não cobrem
+    (ex: json_agg de várias tabelas numa ida só). Usa parâmetros nomeados (:nome).
+    Retorna as linhas como lista de dicts, ou [] se der erro. Não passa pelo cache.
+    """
+    if engine is None: return []
+    try:
+        with engine.connect() as conn:
+            return [dict(r) for r in conn.execute(text(sql), parametros or {}).mappings()]
+    except Exception as e:
+        print(f"Erro silencioso ao ler SQL: {e}")
+        return []
+
+def avisar_erro(mensagem):
+    """
+    Erro de escrita ou do disparo: na tela vira st.error. Fora de uma sessão (threads de disparo,
+    agendador.py) o st.error se perde, então vai para o log do processo.
+    """
+    if get_script_run_ctx(suppress_warning=True) is None:
+        print(mensagem, flush=True)
+    else:
+        st.error(mensagem)
+
 def salvar_novo_registro(dados, tabela):
     """
     Recebe um dicionário (ex: {'nome': 'Joao', 'idade': 25}) 
     e salva como uma nova linha na tabela especificada.
     """
     if engine is None: 
-        st.error("Banco de dados não conectado. Verifique os Secrets.")
+        avisar_erro("Banco de dados não conectado. Verifique os Secrets.")
         return False
         
+    registro = _registros(dados)[0]
+    colunas = tuple(registro)
+    parametros = {f"p{i}": registro[c] for i, c in enumerate(colunas)}
     try:
-        # Transforma o dicionário em uma linha de tabela (DataFrame)
-        df_novo = pd.DataFrame([dados])
-        
-        # 'append': Adiciona ao final sem apagar o que já existe
-        df_novo.to_sql(tabela, engine, if_exists='append', index=False)
+        try:
+            # Caminho rápido: um INSERT já montado para estas colunas
+            with engine.begin() as conn:
+                conn.execute(_comando_insert(tabela, colunas), parametros)
+        except ProgrammingError:
+            # Tabela ou coluna ainda não existe: cria e tenta de novo
+            with engine.begin() as conn:
+                _preparar_tabela(conn, tabela, pd.DataFrame([registro]))
+                conn.execute(_comando_insert(tabela, colunas), parametros)
+            _esquecer_estrutura(tabela)
         return True
     
     except Exception as e:
-        st.error(f"Erro ao salvar registro: {e}")
+        avisar_erro(f"Erro ao salvar registro: {e}")
         return False
 
+    finally:
+        invalidar_cache(tabela)
+
 def atualizar_tabela_completa(df, tabela):
     """
-    ⚠️ PERIGO: Substitui a tabela inteira do banco pelo DataFrame fornecido.
-    Usado quando editamos/excluímos usuários ou limpamos avisos.
+    ⚠️ PERIGO: Substitui todo o conteúdo da tabela pelo DataFrame fornecido.
+    Usado pelos editores de tabela (parceiros, vídeos, config...).
+    Para mudar poucas linhas prefira update_rows / upsert_rows / delete_rows.
     """
     if engine is None: return
     
+    mudou = _muda_estrutura(tabela, df.columns)
+    try:
+        if _obter_tabela(tabela) is None:
+            # Primeira vez: deixa o pandas criar a tabela
+            df.to_sql(tabela, engine, if_exists='replace', index=False)
+        else:
+            # Esvazia e regrava na MESMA transação, mantendo chaves e tipos da tabela
+            with engine.begin() as conn:
+                if mudou:
+                    _adicionar_colunas_faltantes(conn, tabela, df.columns)
+                conn.execute(text(f'DELETE FROM "{tabela}"'))
+                df.to_sql(tabela, conn, if_exists='append', index=False)
+    except Exception as e:
+        st.error(f"Erro ao atualizar banco de dados: {e}")
+    finally:
+        if mudou: _esquecer_estrutura(tabela)
+        invalidar_cache(tabela)
+
+# ===================================================
+# 4. ESCRITA POR LINHA (CHAVES PRIMÁRIAS)
+# ===================================================
+# Chave de cada tabela (declarada em schema.py). É o alvo padrão do upsert.
+CHAVES_PRIMARIAS = schema.chaves_primarias()
+
+_tabelas_com_chave = set()
+
+def _valor_python(valor):
+    """NaN/NaT viram None e tipos do numpy viram tipos Python (o psycopg2 não conhece numpy)."""
+    if isinstance(valor, np.generic):
+        valor = valor.item()
+    if pd.api.types.is_scalar(valor) and pd.isna(valor):
+        return None
+    return valor
+
+def _registros(dados):
+    """Aceita dict, lista de dicts ou DataFrame e devolve lista de dicts com tipos Python puros."""
+    if isinstance(dados, pd.DataFrame):
+        dados = dados.to_dict("records")
+    elif isinstance(dados, dict):
+        dados = [dados]
+    return [{k: _valor_python(v) for k, v in linha.items()} for linha in dados]
+
+def _adicionar_colunas_faltantes(conn, tabela, colunas):
+    """Cria como TEXT as colunas que o DataFrame tem e a tabela ainda não (ex: nova pergunta de check-in)."""
+    existentes = schema.colunas_existentes(conn, tabela)
+    for coluna in colunas:
+        if coluna not in existentes:
+            conn.execute(text(f'ALTER TABLE "{tabela}" ADD COLUMN IF NOT EXISTS "{coluna}" TEXT'))
+
+def _garantir_chave_primaria(conn, tabela, chaves=None):
+    """Garante a PRIMARY KEY usada pelo upsert (o migrar() já cria as das tabelas declaradas)."""
+    chaves = chaves or CHAVES_PRIMARIAS.get(tabela)
+    if not chaves or tabela in _tabelas_com_chave:
+        return
+    schema.garantir_chave_primaria(conn, tabela, chaves)
+    _tabelas_com_chave.add(tabela)
+
+def update_rows(tabela, valores, filtros):
+    """
+    Atualiza só as linhas que batem com os filtros (mesmo formato de consultar()).
+    Ex: update_rows("checkins", {"status": "Revisado"}, {"username": "ana", "data": "2025-12-21"})
+    Retorna True/False.
+    """
+    if engine is None: return False
+    if not filtros:
+        raise ValueError("update_rows exige filtros (use atualizar_tabela_completa para a tabela toda)")
+
+    try:
+        tb = _obter_tabela(tabela)
+        if tb is None: return False
+        with engine.begin() as conn:
+            _garantir_chave_primaria(conn, tabela)
+            conn.execute(tb.update().where(*_montar_condicoes(tb, filtros)).values(**_registros(valores)[0]))
+        return True
+    except Exception as e:
+        avisar_erro(f"Erro ao atualizar registro: {e}")
+        return False
+    finally:
+        invalidar_cache(tabela)
+
+def delete_rows(tabela, filtros):
+    """
+    Apaga só as linhas que batem com os filtros.
+    Ex: delete_rows("usuarios", {"username": "ana"})
+    Retorna True/False.
+    """
+    if engine is None: return False
+    if not filtros:
+        raise ValueError("delete_rows exige filtros")
+
+    try:
+        tb = _obter_tabela(tabela)
+        if tb is None: return False
+        with engine.begin() as conn:
+            conn.execute(tb.delete().where(*_montar_condicoes(tb, filtros)))
+        return True
+    except Exception as e:
+        avisar_erro(f"Erro ao excluir registro: {e}")
+        return False
+    finally:
+        invalidar_cache(tabela)
+
+def executar_sql(sql, parametros=None, tabela=None):
+    """
+    Executa um comando SQL escrito à mão, para o que update/upsert/delete não
+    cobrem (ex: operação bit a bit). Usa parâmetros nomeados (:nome).
+    Retorna as linhas do RETURNING como lista de dicts ([] sem RETURNING),
+    ou None se der erro. Invalida o cache de `tabela`.
+    """
+    if engine is None: return None
     try:
-        # 'replace': Apaga a tabela antiga e cria uma nova com os dados atuais
-        df.to_sql(tabela, engine, if_exists='replace', index=False)
+        with engine.begin() as conn:
+            resultado = conn.execute(text(sql), parametros or {})
+            return [dict(r) for r in resultado.mappings()] if resultado.returns_rows else []
+    except Exception as e:
+        avisar_erro(f"Erro ao executar comando no banco: {e}")
+        return None
+    finally:
+        if tabela: invalidar_cache(tabela)
+
+def upsert_rows(tabela, dados, chaves=None):
+    """
+    Insere ou atualiza (INSERT ... ON CONFLICT DO UPDATE) pela chave primária.
+    - dados: dict, lista de dicts ou DataFrame
+    - chaves: colunas da chave (padrão: CHAVES_PRIMARIAS[tabela])
+    Só as colunas presentes em `dados` são atualizadas nas linhas existentes.
+    Retorna True/False.
+    """
+    if engine is None: return False
+    chaves = chaves or CHAVES_PRIMARIAS.get(tabela)
+    if not chaves:
+        raise ValueError(f"Tabela '{tabela}' sem chave para upsert")
+
+    # Agrupa por conjunto de colunas: cada grupo vira um único INSERT ... ON CONFLICT
+    grupos = {}
+    for registro in _registros(dados):
+        grupos.setdefault(tuple(registro), []).append(registro)
+    if not grupos: return True
+
+    todas_colunas = {c for cols in grupos for c in cols}
+    mudou = _muda_estrutura(tabela, todas_colunas)
+    try:
+        if _obter_tabela(tabela) is None:
+            # Primeira escrita: cria a tabela a partir dos próprios dados
+            pd.DataFrame(next(iter(grupos.values()))).head(0).to_sql(tabela, engine, index=False)
+        with engine.begin() as conn:
+            if mudou:
+                _adicionar_colunas_faltantes(conn, tabela, todas_colunas)
+            _garantir_chave_primaria(conn, tabela, chaves)
+            tb = _obter_tabela(tabela, conn) if mudou else _obter_tabela(tabela)
+            for colunas, registros in grupos.items():
+                comando = pg_insert(tb).values(registros)
+                atualizar = {c: comando.excluded[c] for c in colunas if c not in chaves}
+                if atualizar:
+                    comando = comando.on_conflict_do_update(index_elements=chaves, set_=atualizar)
+                else:
+                    comando = comando.on_conflict_do_nothing(index_elements=chaves)
+                conn.execute(comando)
+        return True
     except Exception as e:
-        st.error(f"Erro ao atualizar banco de dados: {e}")
\ No newline at end of file
+        avisar_erro(f"Erro ao salvar registros: {e}")
+        return False
+    finally:
+        if mudou: _esquecer_estrutura(tabela)
+        invalidar_cache(tabela)
+
+# ===================================================
+# 5. INSERÇÃO EM LOTE
+# ===================================================
+_comandos_insert = {}  # (tabela, colunas) -> INSERT montado uma única vez
+
+def _comando_insert(tabela, colunas):
+    """INSERT com parâmetros posicionais (:p0, :p1...) guardado por tabela/colunas."""
+    chave = (tabela, colunas)
+    comando = _comandos_insert.get(chave)
+    if comando is None:
+        nomes = ", ".join(f'"{c}"' for c in colunas)
+        marcadores = ", ".join(f":p{i}" for i in range(len(colunas)))
+        comando = text(f'INSERT INTO "{tabela}" ({nomes}) VALUES ({marcadores})')
+        _comandos_insert[chave] = comando
+    return comando
+
+def _preparar_tabela(conn, tabela, df_modelo):
+    """Cria a tabela (tipos inferidos pelo pandas) ou só as colunas que faltarem."""
+    if _obter_tabela(tabela, conn) is None:
+        df_modelo.head(0).to_sql(tabela, conn, index=False)
+    else:
+        _adicionar_colunas_faltantes(conn, tabela, df_modelo.columns)
+
+def salvar_registros(dados, tabela):
+    """
+    Salva VÁRIAS linhas de uma vez (lista de dicts ou DataFrame), numa única transação.
+    No PostgreSQL usa COPY FROM STDIN; em outro driver cai para executemany.
+    Ideal para importações (pacientes, lançamentos financeiros...).
+    Retorna True/False.
+    """
+    if engine is None:
+        st.error("Banco de dados não conectado. Verifique os Secrets.")
+        return False
+
+    df = dados if isinstance(dados, pd.DataFrame) else pd.DataFrame(_registros(dados))
+    if df.empty: return True
+
+    colunas = tuple(df.columns)
+    mudou = _muda_estrutura(tabela, colunas)
+    try:
+        with engine.begin() as conn:
+            if mudou:
+                _preparar_tabela(conn, tabela, df)
+            cursor = conn.connection.cursor()
+            if hasattr(cursor, "copy_expert"):
+                # CSV em memória -> COPY (\N marca NULL, texto vazio continua texto vazio)
+                buffer = io.StringIO()
+                df.to_csv(buffer, index=False, header=False, na_rep="\\N")
+                buffer.seek(0)
+                nomes = ", ".join(f'"{c}"' for c in colunas)
+                cursor.copy_expert(f"COPY \"{tabela}\" ({nomes}) FROM STDIN WITH (FORMAT csv, NULL '\\N')", buffer)
+            else:
+                parametros = [{f"p{i}": r[c] for i, c in enumerate(colunas)} for r in _registros(df)]
+                conn.execute(_comando_insert(tabela, colunas), parametros)
+        return True
+    except Exception as e:
+        avisar_erro(f"Erro ao salvar registros em lote: {e}")
+        return False
+    finally:
+        if mudou: _esquecer_estrutura(tabela)
+        invalidar_cache(tabela)
+
+# ===================================================
+# 6. USUÁRIOS (LOGIN E PERFIL)
+# ===================================================
+# Login e páginas do paciente precisam de UMA linha de 'usuarios'. A busca vai
+# pela coluna username_norm (índice único, ver schema.py) e o resultado fica
+# guardado por alguns segundos; qualquer escrita em 'usuarios' (ex: admin
+# editando pacientes) muda a versão da tabela e descarta tudo.
+PERFIL_TTL_SEGUNDOS = float(st.secrets.get("PERFIL_TTL_SEGUNDOS", 30))
+PERFIL_MAX_ENTRADAS = 2048
+
+_perfis = {}  # username normalizado -> (versao, momento, dict ou None)
+
+def normalizar_username(username):
+    return str(username).strip().lower()
+
+def buscar_usuario(username):
+    """
+    Retorna o cadastro do usuário como dict (ignora maiúsculas/espaços), ou None.
+    Uma única linha lida pelo índice, com cache curto por username.
+    """
+    if engine is None: return None
+    chave = normalizar_username(username)
+    versao = versao_tabela("usuarios")
+
+    with _trava_cache:
+        item = _perfis.get(chave)
+    if item is not None and item[0] == versao and time.monotonic() - item[1] < PERFIL_TTL_SEGUNDOS:
+        return dict(item[2]) if item[2] is not None else None
+
+    try:
+        tb = _obter_tabela("usuarios")
+        if tb is None: return None
+        colunas = [c for c in tb.c if c.name not in schema.colunas_geradas("usuarios")]
+        # Banco ainda sem a coluna gerada (migração falhou): mesma regra, sem índice
+        busca = tb.c.username_norm if "username_norm" in tb.c else func.lower(func.btrim(tb.c.username))
+        with engine.connect() as conn:
+            linha = conn.execute(select(*colunas).where(busca == chave).limit(1)).mappings().first()
+    except Exception as e:
+        print(f"Erro silencioso ao buscar usuário: {e}")
+        _esquecer_estrutura("usuarios")
+        return None
+
+    perfil = dict(linha) if linha is not None else None
+    with _trava_cache:
+        if versao == _versoes.get("usuarios", 0):
+            if len(_perfis) >= PERFIL_MAX_ENTRADAS:
+                _perfis.clear()
+            _perfis[chave] = (versao, time.monotonic(), perfil)
+    return dict(perfil) if perfil is not None else None
+
+def guardar_perfil_sessao(perfil, versao=None):
+    """Guarda na sessão o cadastro do usuário logado (sem a senha) e a versão lida."""
+    st.session_state["perfil"] = {k: v for k, v in perfil.items() if k != "password"}
+    st.session_state["perfil_versao"] = versao_tabela("usuarios") if versao is None else versao
+
+def perfil_sessao():
+    """
+    Cadastro do usuário logado, guardado na sessão desde o login.
+    Só relê o banco quando 'usuarios' mudou desde a última leitura; navegar
+    entre as páginas não custa nenhuma consulta.
+    """
+    perfil = st.session_state.get("perfil")
+    versao = versao_tabela("usuarios")
+    if perfil is not None and st.session_state.get("perfil_versao") == versao:
+        return perfil
+
+    usuario = st.session_state.get("usuario_atual")
+    if not usuario: return None
+    dados = buscar_usuario(usuario)
+    if dados is None: return None
+    guardar_perfil_sessao(dados, versao)
+    return st.session_state["perfil"]
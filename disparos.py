@@ -0,0 +1,191 @@
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import requests
+import streamlit as st
+
+from database import carregar_dados, agregar, salvar_registros, update_rows, executar_sql, avisar_erro
+
+# ===================================================
+# DISPARO DE MENSAGENS (WHATSAPP / Z-API)
+# ===================================================
+# Cada envio vira uma linha em 'envios_whatsapp' (status pendente -> enviando -> enviado/falhou).
+# O disparo roda numa thread em segundo plano: várias mensagens ao mesmo tempo,
+# limitadas por segundo, com novas tentativas quando a API falha.
+# A tela só consulta o progresso na tabela, sem ficar travada esperando.
+# Cada mensagem é "pega" no banco antes de sair (UPDATE ... SKIP LOCKED): o agendador
+# e a tela podem disparar o mesmo lote sem que ninguém receba duas vezes.
+
+TABELA_ENVIOS = "envios_whatsapp"
+
+# Endereço da Z-API. Em teste, aponte para o servidor local (benchmarks/disparo_whatsapp.py)
+ZAPI_URL_BASE = st.secrets.get("ZAPI_URL_BASE", "https://api.z-api.io")
+DISPARO_TRABALHADORES = int(st.secrets.get("DISPARO_TRABALHADORES", 4))
+DISPARO_POR_SEGUNDO = float(st.secrets.get("DISPARO_POR_SEGUNDO", 5))
+DISPARO_TENTATIVAS = int(st.secrets.get("DISPARO_TENTATIVAS", 3))
+TIMEOUT_SEGUNDOS = 10
+# Mensagem 'enviando' sem movimento há mais que isso: o processo caiu, pode ser pega de novo
+PARADO_SEGUNDOS = 120
+
+# Lotes sendo enviados por este processo: {lote: Thread}
+_lotes_ativos = {}
+_trava_lotes = threading.Lock()
+
+class _BaldeDeFichas:
+    """Limite de envios por segundo (token bucket) compartilhado entre as threads."""
+
+    def __init__(self, por_segundo):
+        self.por_segundo = por_segundo
+        self.fichas = por_segundo
+        self.ultimo = time.monotonic()
+        self.trava = threading.Lock()
+
+    def pegar(self):
+        while True:
+            with self.trava:
+                agora = time.monotonic()
+                self.fichas = min(self.por_segundo, self.fichas + (agora - self.ultimo) * self.por_segundo)
+                self.ultimo = agora
+                if self.fichas >= 1:
+                    self.fichas -= 1
+                    return
+                espera = (1 - self.fichas) / self.por_segundo
+            time.sleep(espera)
+
+def enviar_mensagem(telefone, mensagem, instancia, token, url_base=None):
+    """
+    Uma chamada ao endpoint send-text da Z-API.
+    Retorna (ok, detalhe, vale_repetir): erro de rede, 429 e 5xx valem nova tentativa.
+    """
+    url = f"{url_base or ZAPI_URL_BASE}/instances/{instancia}/token/{token}/send-text"
+    payload = {"phone": "55" + telefone, "message": mensagem}
+    try:
+        resposta = requests.post(url, json=payload, timeout=TIMEOUT_SEGUNDOS)
+    except requests.RequestException as e:
+        return False, str(e), True
+    if resposta.ok:
+        return True, "", False
+    repetir = resposta.status_code == 429 or resposta.status_code >= 500
+    return False, f"HTTP {resposta.status_code}: {resposta.text[:200]}", repetir
+
+def _enviar_com_tentativas(envio, instancia, token, balde, url_base):
+    detalhe = ""
+    for tentativa in range(1, DISPARO_TENTATIVAS + 1):
+        balde.pegar()
+        ok, detalhe, repetir = enviar_mensagem(envio["telefone"], envio["mensagem"], instancia, token, url_base)
+        if ok:
+            agora = datetime.now()
+            update_rows(TABELA_ENVIOS, {"status": "enviado", "tentativas": tentativa, "erro": None,
+                                        "enviado_em": agora, "atualizado_em": agora}, {"id": envio["id"]})
+            return
+        if not repetir:
+            break
+        if tentativa < DISPARO_TENTATIVAS:
+            # Espera crescente (0.5s, 1s, 2s...) com um pouco de variação
+            time.sleep(0.5 * 2 ** (tentativa - 1) + random.uniform(0, 0.25))
+    update_rows(TABELA_ENVIOS, {"status": "falhou", "tentativas": tentativa, "erro": detalhe,
+                                "atualizado_em": datetime.now()}, {"id": envio["id"]})
+
+def credenciais_api():
+    """(instancia, token) da Z-API cadastrados na aba Config ("" se faltar)."""
+    df_conf = carregar_dados("config_api")
+    if df_conf.empty: return "", ""
+    instancia = str(df_conf.iloc[0]["instancia"]) if "instancia" in df_conf.columns else ""
+    token = str(df_conf.iloc[0]["token"]) if "token" in df_conf.columns else ""
+    return instancia, token
+
+def criar_lote(destinatarios, lote=None):
+    """
+    Registra as mensagens como 'pendente' e devolve o código do lote.
+    destinatarios: lista de dicts com username, telefone e mensagem.
+    lote: código fixo (ex: lembretes do dia); sem ele é gerado um novo.
+    """
+    lote = lote or datetime.now().strftime("%Y%m%d%H%M%S-") + uuid.uuid4().hex[:6]
+    agora = datetime.now()
+    linhas = [{"lote": lote, "username": d["username"], "telefone": d["telefone"], "mensagem": d["mensagem"],
+               "status": "pendente", "tentativas": 0, "criado_em": agora, "atualizado_em": agora}
+              for d in destinatarios]
+    if not linhas or not salvar_registros(linhas, TABELA_ENVIOS):
+        return None
+    return lote
+
+def _pegar_proxima(lote):
+    """Marca UMA mensagem do lote como 'enviando' e devolve (None quando acabou)."""
+    agora = datetime.now()
+    linhas = executar_sql(
+        """
+        UPDATE envios_whatsapp SET status = 'enviando', atualizado_em = :agora
+        WHERE id = (
+            SELECT id FROM envios_whatsapp
+            WHERE lote = :lote
+              AND (status = 'pendente' OR (status = 'enviando' AND atualizado_em < :parado))
+            ORDER BY id LIMIT 1
+            FOR UPDATE SKIP LOCKED
+        )
+        RETURNING id, telefone, mensagem
+        """,
+        {"lote": lote, "agora": agora, "parado": agora - timedelta(seconds=PARADO_SEGUNDOS)},
+        tabela=TABELA_ENVIOS,
+    )
+    return linhas[0] if linhas else None
+
+def _trabalhador(lote, instancia, token, balde, url_base):
+    while True:
+        envio = _pegar_proxima(lote)
+        if envio is None:
+            return
+        _enviar_com_tentativas(envio, instancia, token, balde, url_base)
+
+def _executar_lote(lote, instancia, token, url_base):
+    try:
+        balde = _BaldeDeFichas(DISPARO_POR_SEGUNDO)
+        with ThreadPoolExecutor(max_workers=DISPARO_TRABALHADORES) as pool:
+            for _ in range(DISPARO_TRABALHADORES):
+                pool.submit(_trabalhador, lote, instancia, token, balde, url_base)
+    except Exception as e:
+        avisar_erro(f"Erro no disparo do lote {lote}: {e}")
+    finally:
+        with _trava_lotes:
+            _lotes_ativos.pop(lote, None)
+
+def disparar_lote(lote, instancia, token, url_base=None, esperar=False):
+    """
+    Envia as mensagens pendentes do lote em segundo plano e retorna na hora.
+    Chamar de novo para o mesmo lote retoma o que ficou pendente (ex: após reinício).
+    esperar=True bloqueia até o fim (uso fora da tela, ex: agendador).
+    """
+    with _trava_lotes:
+        if lote in _lotes_ativos:
+            return
+        thread = threading.Thread(target=_executar_lote, args=(lote, instancia, token, url_base), daemon=True)
+        _lotes_ativos[lote] = thread
+    thread.start()
+    if esperar:
+        thread.join()
+
+def _resumo_lote(lote):
+    # Sem cache: o agendador grava nesta tabela de outro processo
+    return agregar(TABELA_ENVIOS, ["status"], {"n": ("count", "id"), "ultima": ("max", "atualizado_em")},
+                   filtros={"lote": lote}, usar_cache=False)
+
+def lote_em_andamento(lote):
+    """True se o lote está saindo, por este processo ou por outro (agendador)."""
+    with _trava_lotes:
+        if lote in _lotes_ativos:
+            return True
+    df = _resumo_lote(lote)
+    if df.empty or "enviando" not in set(df["status"]):
+        return False
+    # Só o movimento das mensagens ainda na fila conta (uma falha recente não é andamento)
+    na_fila = df[df["status"].isin(["pendente", "enviando"])]
+    return datetime.now() - na_fila["ultima"].max() < timedelta(seconds=PARADO_SEGUNDOS)
+
+def progresso_lote(lote):
+    """{status: quantidade} do lote, ex: {"pendente": 3, "enviando": 4, "enviado": 40, "falhou": 1}."""
+    df = _resumo_lote(lote)
+    if df.empty: return {}
+    return dict(zip(df["status"], df["n"].astype(int)))
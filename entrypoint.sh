@@ -0,0 +1,9 @@
+#!/bin/sh
+# Agendador de lembretes (agendador.py) roda ao lado do site.
+# Para desligar: variável de ambiente AGENDADOR=0
+if [ "${AGENDADOR:-1}" != "0" ]; then
+    python agendador.py &
+fi
+
+# O site continua sendo o processo principal do container
+exec streamlit run app.py --server.port=8501 --server.address=0.0.0.0
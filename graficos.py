@@ -0,0 +1,85 @@
+import altair as alt
+import numpy as np
+import pandas as pd
+
+# ===================================================
+# DADOS DOS GRÁFICOS DE EVOLUÇÃO (PESO, NOTAS...)
+# ===================================================
+# O navegador nunca recebe mais que PONTOS_MAXIMOS pontos por série, não importa
+# quanto histórico o paciente (ou a turma) tenha:
+# 1. os check-ins viram médias por semana (ou por mês, se a série passa de um ano)
+#    com uma média móvel de JANELA_MEDIA períodos;
+# 2. se ainda sobrar ponto demais, o LTTB escolhe os que mantêm o desenho da linha.
+# O resultado é um spec Vega-Lite pronto (dict), que pode ser guardado em cache e
+# mostrado com st.vega_lite_chart sem remontar nada.
+
+PONTOS_MAXIMOS = 60
+JANELA_MEDIA = 4
+DIAS_SEMANAL = 366  # acima disso, agrupa por mês
+
+def serie_por_periodo(datas, valores, periodo="W"):
+    """Média dos valores por semana ("W") ou mês ("M"), mais a média móvel. Colunas: data, valor, media."""
+    serie = pd.Series(pd.to_numeric(pd.Series(valores), errors="coerce").to_numpy(dtype=float),
+                      index=pd.to_datetime(pd.Series(datas), errors="coerce")).dropna()
+    serie = serie[serie.index.notna()]
+    if serie.empty:
+        return pd.DataFrame(columns=["data", "valor", "media"])
+    medias = serie.groupby(serie.index.to_period(periodo)).mean()
+    return pd.DataFrame({
+        "data": medias.index.start_time,
+        "valor": medias.to_numpy(),
+        "media": medias.rolling(JANELA_MEDIA, min_periods=1).mean().to_numpy(),
+    })
+
+def lttb(x, y, limite):
+    """
+    Largest-Triangle-Three-Buckets: índices de `limite` pontos que preservam o
+    formato da linha (sempre com o primeiro e o último).
+    """
+    n = len(x)
+    if limite >= n or limite < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    escolhidos = np.empty(limite, dtype=int)
+    escolhidos[0], escolhidos[-1] = 0, n - 1
+    bordas = np.linspace(1, n - 1, limite - 1).astype(int)
+    anterior = 0
+    for i in range(limite - 2):
+        ini, fim = bordas[i], bordas[i + 1]
+        # Média do balde seguinte (o último balde é só o último ponto)
+        prox_fim = bordas[i + 2] if i + 2 < len(bordas) else n
+        mx, my = x[fim:prox_fim].mean(), y[fim:prox_fim].mean()
+        areas = np.abs((x[anterior] - mx) * (y[ini:fim] - y[anterior]) - (x[anterior] - x[ini:fim]) * (my - y[anterior]))
+        anterior = ini + int(np.argmax(areas))
+        escolhidos[i + 1] = anterior
+    return escolhidos
+
+def serie_evolucao(datas, valores, limite=PONTOS_MAXIMOS):
+    """Série pronta para o gráfico: agrupada por período e com no máximo `limite` pontos."""
+    datas = pd.to_datetime(pd.Series(datas), errors="coerce")
+    periodo = "W" if (datas.max() - datas.min()).days <= DIAS_SEMANAL else "M"
+    serie = serie_por_periodo(datas, valores, periodo)
+    if len(serie) > limite:
+        dias = (serie["data"] - serie["data"].iloc[0]).dt.days.to_numpy()
+        serie = serie.iloc[lttb(dias, serie["valor"].to_numpy(), limite)].reset_index(drop=True)
+    return serie
+
+def spec_evolucao(datas, valores, cor, dominio=None, limite=PONTOS_MAXIMOS):
+    """Spec Vega-Lite (dict) da linha de evolução com a média móvel; None se não há dados."""
+    if len(datas) == 0:
+        return None
+    serie = serie_evolucao(datas, valores, limite)
+    if serie.empty or not serie["valor"].any():
+        return None
+
+    escala = alt.Scale(domain=dominio) if dominio else alt.Undefined
+    base = alt.Chart(serie).encode(x=alt.X("data:T", title=None, axis=alt.Axis(format="%d/%m/%y", labelAngle=0)))
+    valor = base.encode(
+        y=alt.Y("valor:Q", title=None, scale=escala),
+        tooltip=[alt.Tooltip("data:T", title="Data", format="%d/%m/%Y"), alt.Tooltip("valor:Q", title="Valor", format=".1f")],
+    )
+    linha = valor.mark_line(color=cor, strokeWidth=3)
+    pontos = valor.mark_circle(color=cor, size=80)
+    media = base.mark_line(color=cor, strokeDash=[4, 4], opacity=0.5).encode(y=alt.Y("media:Q", scale=escala))
+    return (linha + pontos + media).interactive().to_dict()
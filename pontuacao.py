@@ -0,0 +1,85 @@
+from sqlalchemy import text
+
+# ===================================================
+# PONTUAÇÃO DO CHECK-IN (FONTE ÚNICA DOS MAPAS)
+# ===================================================
+# As respostas de escala viram notas de 0 a 100 UMA vez, quando o paciente
+# envia o check-in (views/checkin.py), e ficam gravadas em checkins.score_*.
+# O Painel Admin só lê as colunas prontas.
+# Mudou algum mapa? Aumente VERSAO_PONTUACAO: no próximo deploy a migração
+# "checkins_pontuacao_vN" (schema.py) recalcula todo o histórico numa instrução.
+# Sem esperar o deploy: python pontuacao.py
+
+VERSAO_PONTUACAO = 1
+
+# coluna do score -> (coluna da resposta, {resposta: nota})
+MAPAS = {
+    "score_aderencia": ("aderencia", {
+        "Estou conseguindo seguir tudo tranquilamente": 100,
+        "Consigo seguir tudo, mas às vezes passo por alguma dificuldade": 75,
+        "Não consigo realizar tudo": 40,
+        "Não estou conseguindo realizar nada": 0,
+        "100%": 100, "75%": 75,
+    }),
+    "score_dedicacao": ("dedicacao", {
+        "Dei o meu melhor": 100, "Me dediquei": 75, "Neutro": 50, "Poderia ter feito mais": 25, "Não me dediquei nada": 0,
+    }),
+    "score_disposicao": ("disposicao", {
+        "Muito disposto(a)": 100, "Geralmente disposto(a)": 75, "Depende do dia": 50,
+        "Geralmente indisposto(a)": 25, "Zero disposição": 0,
+    }),
+    "score_rotina": ("rotina", {
+        "Bem estruturada e equilibrada": 100, "Um pouco desorganizada, mas consigo lidar": 50,
+        "Muito desorganizada e me sinto sobrecarregado": 0,
+    }),
+    "score_evolucao": ("evolucao", {
+        "Bastante evolução": 100, "Consigo notar evolução": 75, "Não noto evolução": 50,
+        "Talvez esteja regredindo": 25, "Estou regredindo": 0,
+    }),
+    "score_sono": ("sono_qualidade", {
+        "Ótimo": 100, "Bom": 75, "Neutro": 50, "Ruim": 25, "Terrível": 0,
+    }),
+    # Estresse e ansiedade: quanto MAIOR, pior
+    "score_estresse": ("estresse", {
+        "Não estive estressado(a)": 0, "Um pouco estressado(a)": 50, "Constantemente estressado(a)": 100,
+    }),
+    "score_ansiedade": ("ansiedade", {
+        "Não senti ansiedade": 0, "Senti ansiedade em momentos específicos": 50, "Senti ansiedade de forma constante": 100,
+    }),
+}
+COLUNAS_SCORE = list(MAPAS) + ["nota_geral", "pontuacao_versao"]
+
+def pontuar(respostas):
+    """Notas de um check-in (dict de respostas) prontas para gravar junto com ele."""
+    notas = {score: mapa.get(respostas.get(coluna), 0) for score, (coluna, mapa) in MAPAS.items()}
+    notas["nota_geral"] = (notas["score_aderencia"] + notas["score_dedicacao"]) / 2
+    notas["pontuacao_versao"] = VERSAO_PONTUACAO
+    return notas
+
+def recalcular_pontuacoes(conn, todos=False):
+    """
+    Recalcula no Postgres (um UPDATE com CASE) os check-ins de versão antiga,
+    ou todos com todos=True. Recebe uma conexão aberta (roda dentro da migração).
+    Retorna quantos check-ins mudaram.
+    """
+    parametros = {"versao": VERSAO_PONTUACAO}
+    casos = {}
+    for score, (coluna, mapa) in MAPAS.items():
+        quandos = []
+        for i, (resposta, nota) in enumerate(mapa.items()):
+            parametros[f"{score}_{i}"] = resposta
+            quandos.append(f"WHEN :{score}_{i} THEN {int(nota)}")
+        casos[score] = f"CASE {coluna} {' '.join(quandos)} ELSE 0 END"
+
+    atribuicoes = [f"{score} = {caso}" for score, caso in casos.items()]
+    atribuicoes.append(f"nota_geral = (({casos['score_aderencia']}) + ({casos['score_dedicacao']})) / 2.0")
+    atribuicoes.append("pontuacao_versao = :versao")
+    filtro = "" if todos else " WHERE pontuacao_versao IS DISTINCT FROM :versao"
+    return conn.execute(text(f"UPDATE checkins SET {', '.join(atribuicoes)}{filtro}"), parametros).rowcount
+
+if __name__ == "__main__":
+    # Recalcula o histórico inteiro: python pontuacao.py
+    from database import engine, invalidar_cache
+    with engine.begin() as conn:
+        print(f"{recalcular_pontuacoes(conn, todos=True)} check-ins recalculados.")
+    invalidar_cache("checkins")
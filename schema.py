@@ -0,0 +1,415 @@
+from sqlalchemy import text
+
+from pontuacao import VERSAO_PONTUACAO, recalcular_pontuacoes
+
+# ===================================================
+# ESQUEMA DO BANCO (DECLARATIVO)
+# ===================================================
+# Antes as tabelas nasciam do DataFrame.to_sql: tudo TEXT, sem chave e sem
+# índice. Aqui fica a forma "oficial" de cada tabela. O migrar() compara com
+# o banco e aplica só o que falta, então pode rodar a cada inicialização.
+#
+# Colunas: nome -> tipo SQL, ou (tipo, valor padrão).
+# Colunas extras que já existirem no banco (ex: perguntas novas do check-in)
+# são mantidas como estão.
+# "geradas": colunas calculadas pelo próprio Postgres (GENERATED ... STORED),
+# só para busca: não aparecem no select * do consultar() e ninguém grava nelas.
+# "unicos": índices UNIQUE (se o banco tiver repetidos, vira índice comum + aviso).
+
+TABELAS = {
+    "usuarios": {
+        "colunas": {
+            "username": "TEXT",
+            "password": "TEXT",
+            "name": "TEXT",
+            "role": "TEXT",
+            "active": "TEXT",
+            "telefone": "TEXT",
+            "dia_checkin": "TEXT",
+            "frequencia": "TEXT",
+            "data_inicio": "TEXT",
+        },
+        "geradas": {
+            # Login ignora maiúsculas e espaços: a busca vai direto no índice
+            "username_norm": "lower(btrim(username))",
+        },
+        "chave": ["username"],
+        "indices": [],
+        "unicos": [["username_norm"]],
+    },
+    "checkins": {
+        "colunas": {
+            "id": "BIGSERIAL",
+            "username": "TEXT",
+            "data": "DATE",
+            "peso": "DOUBLE PRECISION",
+            "aderencia": "TEXT",
+            "aderencia_expl": "TEXT",
+            "dedicacao": "TEXT",
+            "refeicoes_fora": "DOUBLE PRECISION",
+            "dias_alcool": "DOUBLE PRECISION",
+            "treino_forca": "DOUBLE PRECISION",
+            "treino_cardio": "DOUBLE PRECISION",
+            "disposicao": "TEXT",
+            "estresse": "TEXT",
+            "ansiedade": "TEXT",
+            "rotina": "TEXT",
+            "evolucao": "TEXT",
+            "sono_qualidade": "TEXT",
+            "sono_horas": "DOUBLE PRECISION",
+            "alteracoes": "TEXT",
+            "nps": "TEXT",
+            "avaliacao_atend": "DOUBLE PRECISION",
+            "status": "TEXT",
+            # Notas calculadas no envio (ver pontuacao.py)
+            "score_aderencia": "SMALLINT",
+            "score_dedicacao": "SMALLINT",
+            "score_disposicao": "SMALLINT",
+            "score_rotina": "SMALLINT",
+            "score_evolucao": "SMALLINT",
+            "score_sono": "SMALLINT",
+            "score_estresse": "SMALLINT",
+            "score_ansiedade": "SMALLINT",
+            "nota_geral": "DOUBLE PRECISION",
+            "pontuacao_versao": "SMALLINT",
+        },
+        "chave": ["id"],
+        # status + data + username + id: caixa de entrada paginada do admin (keyset)
+        "indices": [["username", "data"], ["status"], ["status", "data", "username", "id"]],
+    },
+    "checklist": {
+        "colunas": {
+            "username": "TEXT",
+            "data": "DATE",
+            # Tarefas do dia num só número, um bit por tarefa (ver BITS_CHECKLIST)
+            "tarefas": ("SMALLINT", "0"),
+        },
+        "chave": ["username", "data"],
+        "indices": [],
+    },
+    "beliscadas": {
+        "colunas": {
+            "id": "BIGSERIAL",
+            "username": "TEXT",
+            "data": "DATE",
+            "hora": "TIME",
+            "alimento": "TEXT",
+            "motivo": "TEXT",
+            "gatilho": "TEXT",
+            "sentimento": "TEXT",
+            "plano_futuro": "TEXT",
+            "status": "TEXT",
+        },
+        "chave": ["id"],
+        "indices": [["username", "data"], ["status"]],
+    },
+    "conclusao_aulas": {
+        "colunas": {
+            "username": "TEXT",
+            "modulo": "TEXT",
+            "data": "TIMESTAMP",
+        },
+        "chave": ["username", "modulo"],
+        "indices": [],
+    },
+    "financeiro": {
+        "colunas": {
+            "id": "BIGSERIAL",
+            "data": "DATE",
+            "tipo": "TEXT",
+            "categoria": "TEXT",
+            "descricao": "TEXT",
+            "valor": "DOUBLE PRECISION",
+            "mes_ano": "TEXT",
+        },
+        "chave": ["id"],
+        "indices": [["data"]],
+    },
+    "avisos": {
+        "colunas": {
+            "id": "BIGSERIAL",
+            "mensagem": "TEXT",
+            "expiracao": "TIMESTAMP",
+            "criado_em": "TIMESTAMP",
+        },
+        "chave": ["id"],
+        "indices": [["expiracao"]],
+    },
+    # Chave própria (arquivo_id): arquivar só acrescenta, mesmo se um id de aviso se repetir
+    "avisos_arquivo": {
+        "colunas": {
+            "arquivo_id": "BIGSERIAL",
+            "id": "BIGINT",
+            "mensagem": "TEXT",
+            "expiracao": "TIMESTAMP",
+            "criado_em": "TIMESTAMP",
+            "arquivado_em": "TIMESTAMP",
+        },
+        "chave": ["arquivo_id"],
+        "indices": [["id"]],
+    },
+    "streaks": {
+        "colunas": {
+            "username": "TEXT",
+            "atual": ("INTEGER", "0"),
+            "melhor": ("INTEGER", "0"),
+            "ultima_data": "DATE",
+            "atualizado_em": "TIMESTAMP",
+        },
+        "chave": ["username"],
+        "indices": [],
+    },
+    "checkin_schedule": {
+        "colunas": {
+            "username": "TEXT",
+            "ativo": ("BOOLEAN", "TRUE"),
+            "dia_semana": "SMALLINT",
+            "frequencia": "TEXT",
+            "ultimo_checkin": "DATE",
+            "liberado_em": "DATE",
+            "proximo_checkin": "DATE",
+            "atualizado_em": "TIMESTAMP",
+        },
+        "chave": ["username"],
+        "indices": [["dia_semana", "proximo_checkin"]],
+    },
+    "envios_whatsapp": {
+        "colunas": {
+            "id": "BIGSERIAL",
+            "lote": "TEXT",
+            "username": "TEXT",
+            "telefone": "TEXT",
+            "mensagem": "TEXT",
+            "status": ("TEXT", "'pendente'"),
+            "tentativas": ("INTEGER", "0"),
+            "erro": "TEXT",
+            "criado_em": "TIMESTAMP",
+            "enviado_em": "TIMESTAMP",
+            "atualizado_em": "TIMESTAMP",
+        },
+        "chave": ["id"],
+        "indices": [["lote", "status"]],
+        # Um paciente só recebe uma mensagem por lote (lote do dia criado duas vezes não duplica)
+        "unicos": [["lote", "username"]],
+    },
+}
+
+# Bit de cada tarefa na coluna checklist.tarefas (agua=1, cardio=2, treino=4...)
+BITS_CHECKLIST = {"agua": 1, "cardio": 2, "treino": 4, "dieta": 8, "sono": 16}
+
+# Nome que o information_schema usa para cada tipo declarado
+_NOME_NO_BANCO = {
+    "TEXT": "text",
+    "DATE": "date",
+    "TIME": "time without time zone",
+    "TIMESTAMP": "timestamp without time zone",
+    "BOOLEAN": "boolean",
+    "SMALLINT": "smallint",
+    "INTEGER": "integer",
+    "BIGINT": "bigint",
+    "BIGSERIAL": "bigint",
+    "DOUBLE PRECISION": "double precision",
+}
+
+# Conversão tolerante do texto antigo: o que não tiver formato válido vira NULL
+_CONVERSOES = {
+    "DATE": "CASE WHEN {c}::text ~ '^\\d{{4}}-\\d{{2}}-\\d{{2}}' THEN substring({c}::text, 1, 10)::date END",
+    "TIME": "CASE WHEN {c}::text ~ '^\\d{{1,2}}:\\d{{2}}' THEN {c}::text::time END",
+    "TIMESTAMP": "CASE WHEN {c}::text ~ '^\\d{{4}}-\\d{{2}}-\\d{{2}}' THEN {c}::text::timestamp END",
+    "BOOLEAN": "coalesce(lower(btrim({c}::text)) IN ('true', 't', '1', 'yes', 'on'), FALSE)",
+    "DOUBLE PRECISION": "CASE WHEN btrim({c}::text) ~ '^-?\\d+([.,]\\d+)?$' THEN replace(btrim({c}::text), ',', '.')::double precision END",
+    "SMALLINT": "CASE WHEN btrim({c}::text) ~ '^-?\\d+$' THEN btrim({c}::text)::smallint END",
+    "INTEGER": "CASE WHEN btrim({c}::text) ~ '^-?\\d+$' THEN btrim({c}::text)::integer END",
+    "BIGINT": "CASE WHEN btrim({c}::text) ~ '^-?\\d+$' THEN btrim({c}::text)::bigint END",
+    "TEXT": "{c}::text",
+}
+
+# Linhas que não puderam ganhar a chave primária (chave nula ou repetida): guardadas em JSON para revisão
+QUARENTENA = "quarentena_migracao"
+# Entre linhas com a mesma chave fica a mais recente por estas colunas (a primeira que a tabela tiver)
+COLUNAS_RECENCIA = ["atualizado_em", "criado_em", "data", "id"]
+
+def _tipo_e_padrao(spec):
+    return spec if isinstance(spec, tuple) else (spec, None)
+
+def _q(nome):
+    """Nome entre aspas (colunas vêm das perguntas do check-in)."""
+    return '"' + nome.replace('"', '""') + '"'
+
+def colunas_geradas(tabela):
+    """Nomes das colunas GENERATED da tabela (vazio se não tiver)."""
+    return set(TABELAS.get(tabela, {}).get("geradas", {}))
+
+def chaves_primarias():
+    """{tabela: [colunas da chave]} de todas as tabelas declaradas."""
+    return {nome: d["chave"] for nome, d in TABELAS.items()}
+
+def colunas_existentes(conn, tabela):
+    """{coluna: tipo} como está hoje no banco (vazio se a tabela não existe)."""
+    linhas = conn.execute(
+        text("SELECT column_name, data_type FROM information_schema.columns "
+             "WHERE table_schema = 'public' AND table_name = :t"),
+        {"t": tabela},
+    )
+    return dict(linhas.fetchall())
+
+def _mover_para_quarentena(conn, tabela, apagar, motivo):
+    """Roda o DELETE ... RETURNING * de `apagar` guardando cada linha apagada na quarentena."""
+    conn.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {QUARENTENA} "
+        "(tabela TEXT NOT NULL, dados JSONB NOT NULL, movido_em TIMESTAMP NOT NULL DEFAULT now())"
+    ))
+    conn.execute(text(f"ALTER TABLE {QUARENTENA} ADD COLUMN IF NOT EXISTS motivo TEXT"))
+    movidas = conn.execute(text(
+        f"WITH movidas AS ({apagar} RETURNING *) "
+        f"INSERT INTO {QUARENTENA} (tabela, motivo, dados) SELECT :t, :motivo, to_jsonb(m) FROM movidas m"
+    ), {"t": tabela, "motivo": motivo}).rowcount
+    if movidas:
+        print(f"Aviso: {movidas} linha(s) de '{tabela}' ({motivo}) foram movidas para {QUARENTENA}.")
+
+def garantir_chave_primaria(conn, tabela, chaves):
+    """
+    Cria a PRIMARY KEY se a tabela não tiver nenhuma. Antes move para a quarentena
+    (QUARENTENA, em JSON) as linhas com chave nula e as duplicatas mais antigas.
+    """
+    tem_pk = conn.execute(
+        text("SELECT 1 FROM pg_index WHERE indrelid = to_regclass(:t) AND indisprimary"),
+        {"t": f"public.{tabela}"},
+    ).scalar()
+    if tem_pk:
+        return
+    # Chave nula (ex.: data ilegível que a conversão de tipo virou NULL) não entra na PK
+    _mover_para_quarentena(
+        conn, tabela,
+        f"DELETE FROM {_q(tabela)} WHERE " + " OR ".join(f"{_q(c)} IS NULL" for c in chaves),
+        f"{', '.join(chaves)} nulo",
+    )
+    # Linhas repetidas (herança do to_sql) impediriam a chave: fica a mais recente pela
+    # primeira coluna de COLUNAS_RECENCIA que existir (empate: a gravada por último)
+    existentes = colunas_existentes(conn, tabela)
+    recencia = [f"{_q(c)} DESC NULLS LAST" for c in COLUNAS_RECENCIA if c in existentes and c not in chaves][:1]
+    ordem = ", ".join(recencia + ["ctid DESC"])
+    grupo = ", ".join(_q(c) for c in chaves)
+    _mover_para_quarentena(
+        conn, tabela,
+        f"DELETE FROM {_q(tabela)} WHERE ctid IN (SELECT ctid FROM (SELECT ctid, "
+        f"row_number() OVER (PARTITION BY {grupo} ORDER BY {ordem}) AS n FROM {_q(tabela)}) r WHERE n > 1)",
+        f"{', '.join(chaves)} repetido",
+    )
+    conn.execute(text(f"ALTER TABLE {_q(tabela)} ADD PRIMARY KEY ({', '.join(_q(c) for c in chaves)})"))
+
+def _sincronizar_tabela(conn, tabela, definicao):
+    existentes = colunas_existentes(conn, tabela)
+
+    if not existentes:
+        colunas = []
+        for nome, spec in definicao["colunas"].items():
+            tipo, padrao = _tipo_e_padrao(spec)
+            colunas.append(f"{_q(nome)} {tipo}" + (f" DEFAULT {padrao}" if padrao else ""))
+        for nome, expressao in definicao.get("geradas", {}).items():
+            colunas.append(f"{_q(nome)} TEXT GENERATED ALWAYS AS ({expressao}) STORED")
+        colunas.append(f"PRIMARY KEY ({', '.join(_q(c) for c in definicao['chave'])})")
+        conn.execute(text(f"CREATE TABLE IF NOT EXISTS {_q(tabela)} ({', '.join(colunas)})"))
+    else:
+        for nome, spec in definicao["colunas"].items():
+            tipo, padrao = _tipo_e_padrao(spec)
+            if nome not in existentes:
+                # Com DEFAULT as linhas que já existem também recebem o valor padrão
+                conn.execute(text(f"ALTER TABLE {_q(tabela)} ADD COLUMN {_q(nome)} {tipo}" + (f" DEFAULT {padrao}" if padrao else "")))
+            elif existentes[nome] != _NOME_NO_BANCO[tipo] and tipo in _CONVERSOES:
+                conversao = _CONVERSOES[tipo].format(c=_q(nome))
+                conn.execute(text(f"ALTER TABLE {_q(tabela)} ALTER COLUMN {_q(nome)} TYPE {tipo} USING {conversao}"))
+            if padrao:
+                conn.execute(text(f"ALTER TABLE {_q(tabela)} ALTER COLUMN {_q(nome)} SET DEFAULT {padrao}"))
+        for nome, expressao in definicao.get("geradas", {}).items():
+            if nome not in existentes:
+                conn.execute(text(f"ALTER TABLE {_q(tabela)} ADD COLUMN {_q(nome)} TEXT GENERATED ALWAYS AS ({expressao}) STORED"))
+        garantir_chave_primaria(conn, tabela, definicao["chave"])
+
+    for colunas in definicao["indices"]:
+        nome_indice = f"ix_{tabela}_{'_'.join(colunas)}"
+        conn.execute(text(
+            f"CREATE INDEX IF NOT EXISTS {_q(nome_indice)} ON {_q(tabela)} ({', '.join(_q(c) for c in colunas)})"
+        ))
+
+    for colunas in definicao.get("unicos", []):
+        lista = ", ".join(_q(c) for c in colunas)
+        repetidos = conn.execute(text(
+            f"SELECT {lista} FROM {_q(tabela)} GROUP BY {lista} HAVING count(*) > 1 LIMIT 5"
+        )).fetchall()
+        if repetidos:
+            # Não apaga cadastro de ninguém: avisa e indexa sem a restrição
+            print(f"Aviso: '{tabela}' tem valores repetidos em {colunas}: {repetidos}. Índice criado sem UNIQUE.")
+            conn.execute(text(f"CREATE INDEX IF NOT EXISTS {_q(f'ix_{tabela}_' + '_'.join(colunas))} ON {_q(tabela)} ({lista})"))
+        else:
+            conn.execute(text(f"CREATE UNIQUE INDEX IF NOT EXISTS {_q(f'ux_{tabela}_' + '_'.join(colunas))} ON {_q(tabela)} ({lista})"))
+
+# ===================================================
+# MIGRAÇÕES DE DADOS (RODAM UMA VEZ)
+# ===================================================
+# Mudanças que não são só "criar o que falta" (mover dados entre colunas...).
+# Cada uma roda uma única vez por banco e fica registrada em schema_migracoes.
+
+def _checklist_para_bitmask(conn):
+    """As 5 colunas booleanas/texto do checklist viram bits da coluna tarefas."""
+    existentes = colunas_existentes(conn, "checklist")
+    antigas = [c for c in BITS_CHECKLIST if c in existentes]
+    if not antigas:
+        return
+    soma = " | ".join(
+        f"(CASE WHEN lower(btrim({_q(c)}::text)) IN ('true', 't', '1') THEN {BITS_CHECKLIST[c]} ELSE 0 END)"
+        for c in antigas
+    )
+    conn.execute(text(f"UPDATE checklist SET tarefas = coalesce(tarefas, 0) | ({soma})"))
+    conn.execute(text("ALTER TABLE checklist " + ", ".join(f"DROP COLUMN {_q(c)}" for c in antigas)))
+
+def _avisos_arquivo_chave_propria(conn):
+    """O arquivo nasceu com a chave em id: troca pela arquivo_id (já preenchida pelo BIGSERIAL)."""
+    chave = conn.execute(text(
+        "SELECT c.conname, array_agg(a.attname::text) FROM pg_constraint c "
+        "JOIN pg_attribute a ON a.attrelid = c.conrelid AND a.attnum = ANY(c.conkey) "
+        "WHERE c.conrelid = to_regclass('public.avisos_arquivo') AND c.contype = 'p' GROUP BY c.conname"
+    )).first()
+    if chave is None or list(chave[1]) == ["arquivo_id"]:
+        return
+    conn.execute(text(f"ALTER TABLE avisos_arquivo DROP CONSTRAINT {_q(chave[0])}"))
+    conn.execute(text("ALTER TABLE avisos_arquivo ADD PRIMARY KEY (arquivo_id)"))
+
+MIGRACOES_DE_DADOS = [
+    ("checklist_bitmask", _checklist_para_bitmask),
+    ("avisos_arquivo_chave_propria", _avisos_arquivo_chave_propria),
+    # O nome muda com a versão: mexer nos mapas de pontuacao.py recalcula o histórico
+    (f"checkins_pontuacao_v{VERSAO_PONTUACAO}", recalcular_pontuacoes),
+]
+
+def _aplicar_migracoes_de_dados(engine):
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE IF NOT EXISTS schema_migracoes (nome TEXT PRIMARY KEY, aplicada_em TIMESTAMP DEFAULT now())"))
+    for nome, funcao in MIGRACOES_DE_DADOS:
+        try:
+            with engine.begin() as conn:
+                conn.execute(text("SELECT pg_advisory_xact_lock(hashtext(:t))"), {"t": f"schema.migracao.{nome}"})
+                feita = conn.execute(text("SELECT 1 FROM schema_migracoes WHERE nome = :n"), {"n": nome}).scalar()
+                if feita:
+                    continue
+                funcao(conn)
+                conn.execute(text("INSERT INTO schema_migracoes (nome) VALUES (:n)"), {"n": nome})
+        except Exception as e:
+            print(f"Erro na migração de dados '{nome}': {e}")
+
+def migrar(engine):
+    """
+    Aplica o esquema declarado em TABELAS. Idempotente: cria o que não existe,
+    converte colunas com tipo diferente, cria chaves e índices que faltam.
+    Cada tabela roda na sua própria transação; um erro numa não impede as outras.
+    Depois roda as migrações de dados ainda não aplicadas.
+    """
+    for tabela, definicao in TABELAS.items():
+        try:
+            with engine.begin() as conn:
+                # Trava por tabela: dois processos subindo juntos não migram ao mesmo tempo
+                conn.execute(text("SELECT pg_advisory_xact_lock(hashtext(:t))"), {"t": f"schema.{tabela}"})
+                _sincronizar_tabela(conn, tabela, definicao)
+        except Exception as e:
+            print(f"Erro ao migrar a tabela '{tabela}': {e}")
+    _aplicar_migracoes_de_dados(engine)
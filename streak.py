@@ -0,0 +1,123 @@
+from datetime import date, datetime, timedelta
+
+import pandas as pd
+
+from database import consultar, upsert_rows
+
+# ===================================================
+# SEQUÊNCIA DE DIAS COM FOCO (STREAK)
+# ===================================================
+# Dia "ativo" = pelo menos uma tarefa marcada no checklist (tarefas > 0).
+# A tabela 'streaks' guarda, por paciente, a sequência que termina em
+# ultima_data (atual) e a maior já feita (melhor). A Home lê uma linha só;
+# salvar_tarefa atualiza o estado a cada marcação, sem reler o checklist.
+
+TABELA_STREAKS = "streaks"
+
+def _dias_ativos(usernames=None):
+    """DataFrame (username, data) dos dias com alguma tarefa feita, sem repetição."""
+    filtros = {"tarefas__gt": 0}
+    if usernames is not None:
+        filtros["username__in"] = list(usernames)
+    df = consultar("checklist", colunas=["username", "data"], filtros=filtros)
+    if df.empty or "data" not in df.columns:
+        return pd.DataFrame(columns=["username", "data"])
+    df = df.dropna()
+    df["data"] = pd.to_datetime(df["data"]).dt.normalize()
+    return df.drop_duplicates().sort_values(["username", "data"])
+
+def recalcular_streaks(usernames=None):
+    """
+    Recalcula do zero o estado de todos os pacientes (ou só dos informados)
+    a partir do checklist. Uso: carga inicial / correção. Retorna quantos salvou.
+    """
+    dias = _dias_ativos(usernames)
+    agora = datetime.now()
+
+    if dias.empty:
+        estados = pd.DataFrame(columns=["username", "atual", "melhor", "ultima_data"])
+    else:
+        # Dias seguidos formam um "bloco": novo bloco quando muda o paciente ou pula um dia
+        novo_bloco = (dias["username"] != dias["username"].shift()) | (dias["data"].diff() != pd.Timedelta(days=1))
+        dias["bloco"] = novo_bloco.cumsum()
+        blocos = dias.groupby(["username", "bloco"]).agg(tamanho=("data", "size"), fim=("data", "max")).reset_index()
+        por_usuario = blocos.groupby("username")
+        ultimo = blocos.loc[por_usuario["fim"].idxmax()].set_index("username")
+        estados = pd.DataFrame({
+            "atual": ultimo["tamanho"],
+            "melhor": por_usuario["tamanho"].max(),
+            "ultima_data": ultimo["fim"].dt.date,
+        }).reset_index()
+
+    # Quem foi pedido e não tem nenhum dia ativo volta para zero
+    if usernames is not None:
+        sem_dias = [u for u in usernames if u not in set(estados["username"])]
+        zerados = pd.DataFrame({"username": sem_dias, "atual": 0, "melhor": 0, "ultima_data": None})
+        estados = pd.concat([estados, zerados], ignore_index=True) if sem_dias else estados
+
+    if estados.empty: return 0
+    estados["atualizado_em"] = agora
+    estados[["atual", "melhor"]] = estados[["atual", "melhor"]].astype(int)
+    upsert_rows(TABELA_STREAKS, estados)
+    return len(estados)
+
+def _estado(usuario):
+    df = consultar(TABELA_STREAKS, filtros={"username": usuario}, limite=1)
+    if df.empty: return None
+    linha = df.iloc[0]
+    ultima = pd.to_datetime(linha["ultima_data"]).date() if pd.notnull(linha["ultima_data"]) else None
+    return {"atual": int(linha["atual"]), "melhor": int(linha["melhor"]), "ultima_data": ultima}
+
+def registrar_dia(usuario, dia, ativo):
+    """
+    Atualiza o estado depois que o checklist de `dia` mudou.
+    ativo: se o dia ficou com pelo menos uma tarefa feita.
+    """
+    estado = _estado(usuario)
+    if estado is None:
+        recalcular_streaks([usuario])
+        return
+
+    atual, melhor, ultima = estado["atual"], estado["melhor"], estado["ultima_data"]
+    if ativo:
+        if ultima == dia:
+            return
+        if ultima == dia - timedelta(days=1):
+            atual += 1
+        elif ultima is not None and ultima > dia:
+            # Marcação num dia antigo pode juntar sequências: refaz só este paciente
+            recalcular_streaks([usuario])
+            return
+        else:
+            atual = 1
+        upsert_rows(TABELA_STREAKS, {"username": usuario, "atual": atual, "melhor": max(melhor, atual),
+                                     "ultima_data": dia, "atualizado_em": datetime.now()})
+    elif ultima is not None and ultima >= dia:
+        # Desmarcou um dia que fazia parte da sequência (raro): refaz só este paciente
+        recalcular_streaks([usuario])
+
+def streak_atual(usuario):
+    """Dias seguidos até hoje. Se hoje ainda não marcou nada, conta até ontem."""
+    estado = _estado(usuario)
+    if estado is None:
+        # Paciente ainda sem estado salvo: calcula uma vez e guarda
+        recalcular_streaks([usuario])
+        estado = _estado(usuario)
+        if estado is None: return 0
+    ultima = estado["ultima_data"]
+    if ultima is None or ultima < date.today() - timedelta(days=1):
+        return 0
+    return estado["atual"]
+
+def streaks_da_turma(hoje=None):
+    """Series username -> dias seguidos até hoje, de todos os pacientes (uma consulta)."""
+    hoje = pd.Timestamp(hoje or date.today())
+    df = consultar(TABELA_STREAKS, colunas=["username", "atual", "ultima_data"])
+    if df.empty: return pd.Series(dtype=int)
+    # Mesma regra do streak_atual: sequência que parou antes de ontem não vale mais
+    vigente = pd.to_datetime(df["ultima_data"]) >= hoje - pd.Timedelta(days=1)
+    return df["atual"].fillna(0).where(vigente, 0).astype(int).set_axis(df["username"])
+
+if __name__ == "__main__":
+    # Carga inicial: python streak.py
+    print(f"{recalcular_streaks()} pacientes recalculados.")
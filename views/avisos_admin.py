@@ -1,8 +1,75 @@
 import streamlit as st
-import pandas as pd
+import threading
+import time
 from datetime import datetime, timedelta
 # Importamos as funções do Banco de Dados
-from database import carregar_dados, salvar_novo_registro, atualizar_tabela_completa
+from database import consultar, salvar_novo_registro, update_rows, executar_sql, versao_tabela
+
+# --- AVISOS ATIVOS (LIDOS PELA HOME DE TODOS OS PACIENTES) ---
+# O Postgres devolve só os avisos que ainda não expiraram (índice em expiracao).
+# A lista fica guardada no processo até o próximo aviso vencer ou até alguém
+# publicar/apagar um aviso (a versão da tabela muda), o que vier primeiro.
+AVISOS_RELEITURA_MAXIMA = timedelta(minutes=5)  # outro processo pode ter publicado
+AVISOS_LIMPEZA_MINUTOS = 10
+
+_avisos = {"versao": None, "valido_ate": datetime.min, "mensagens": []}
+_trava_avisos = threading.Lock()
+
+def avisos_ativos():
+    """Mensagens dos avisos ainda válidos, do que vence primeiro ao último."""
+    agora = datetime.now()
+    versao = versao_tabela("avisos")
+    with _trava_avisos:
+        if _avisos["versao"] == versao and agora < _avisos["valido_ate"]:
+            return list(_avisos["mensagens"])
+
+    iniciar_limpeza_avisos()
+    df = consultar("avisos", colunas=["mensagem", "expiracao"], filtros={"expiracao__gt": agora},
+                   ordem=["expiracao"], usar_cache=False)
+    mensagens = df["mensagem"].dropna().tolist() if not df.empty else []
+
+    # Vale até o primeiro aviso vencer (ou a releitura máxima, se vier antes)
+    valido_ate = agora + AVISOS_RELEITURA_MAXIMA
+    if not df.empty:
+        valido_ate = min(valido_ate, df["expiracao"].min().to_pydatetime())
+    with _trava_avisos:
+        _avisos.update(versao=versao, valido_ate=valido_ate, mensagens=mensagens)
+    return list(mensagens)
+
+def arquivar_avisos_expirados():
+    """
+    Move os avisos vencidos para avisos_arquivo (um único comando). Retorna quantos.
+    O arquivo tem chave própria: o INSERT só acrescenta, nada já arquivado é sobrescrito.
+    """
+    linhas = executar_sql(
+        """
+        WITH vencidos AS (
+            DELETE FROM avisos WHERE expiracao <= :agora
+            RETURNING id, mensagem, expiracao, criado_em
+        )
+        INSERT INTO avisos_arquivo (id, mensagem, expiracao, criado_em, arquivado_em)
+        SELECT id, mensagem, expiracao, criado_em, :agora FROM vencidos
+        RETURNING id
+        """,
+        {"agora": datetime.now()},
+        tabela="avisos",
+    )
+    return len(linhas or [])
+
+def _limpeza_periodica():
+    while True:
+        try:
+            arquivar_avisos_expirados()
+        except Exception as e:
+            print(f"Erro silencioso na limpeza de avisos: {e}")
+        time.sleep(AVISOS_LIMPEZA_MINUTOS * 60)
+
+@st.cache_resource
+def iniciar_limpeza_avisos():
+    """Sobe UMA thread por processo que arquiva os avisos vencidos de tempos em tempos."""
+    thread = threading.Thread(target=_limpeza_periodica, daemon=True)
+    thread.start()
+    return thread
 
 def show_enviar_avisos():
     st.title("📢 Enviar Avisos aos Pacientes")
@@ -18,11 +85,13 @@ def show_enviar_avisos():
                 st.warning("Por favor, digite uma mensagem.")
             else:
                 # Agora calcula a expiração somando HORAS
-                expira = datetime.now() + timedelta(hours=horas)
+                agora = datetime.now()
+                expira = agora + timedelta(hours=horas)
                 
                 novo_dado = {
                     "mensagem": f"🚨Aviso: {msg_input}",
-                    "expiracao": expira.strftime("%Y-%m-%d %H:%M:%S")
+                    "expiracao": expira.replace(microsecond=0),
+                    "criado_em": agora.replace(microsecond=0),
                 }
                 
                 # SALVA NO BANCO DE DADOS (POSTGRESQL)
@@ -32,8 +101,10 @@ def show_enviar_avisos():
                 else:
                     st.error("Erro ao salvar aviso no banco.")
 
-    # Carrega os avisos atuais para decidir se mostra o botão de apagar
-    df_avisos = carregar_dados("avisos")
+    # Só os avisos que ainda não venceram (os vencidos vão para o arquivo)
+    agora = datetime.now()
+    df_avisos = consultar("avisos", colunas=["mensagem", "expiracao"], filtros={"expiracao__gt": agora},
+                          ordem=["expiracao"], usar_cache=False)
     
     if not df_avisos.empty:
         st.divider()
@@ -41,9 +112,9 @@ def show_enviar_avisos():
         st.dataframe(df_avisos, use_container_width=True)
         
         if st.button("🗑️ Apagar todos os avisos ativos"):
-            # Para "apagar" no banco, nós salvamos uma tabela vazia por cima
-            df_limpo = pd.DataFrame(columns=["mensagem", "expiracao"])
-            atualizar_tabela_completa(df_limpo, "avisos")
+            # Vence todos agora e manda para o arquivo (histórico fica guardado)
+            update_rows("avisos", {"expiracao": agora}, {"expiracao__gt": agora})
+            arquivar_avisos_expirados()
             
             st.success("Todos os avisos foram apagados do Banco de Dados.")
-            st.rerun()
\ No newline at end of file
+            st.rerun()
@@ -3,7 +3,9 @@ import pandas as pd
 import os
 from datetime import datetime, date
 # IMPORTS DO BANCO DE DADOS
-from database import carregar_dados, salvar_novo_registro
+from database import salvar_novo_registro, perfil_sessao
+from pontuacao import pontuar
+from agenda import agenda_do_paciente, atualizar_agenda, DIAS_SEMANA, CARENCIA
 
 # --- CONFIGURAÇÃO ---
 # Mantemos apenas o arquivo de configuração das perguntas
@@ -11,30 +13,6 @@ ARQUIVO_PERGUNTAS = "data/perguntas_checkin.csv"
 
 # --- FUNÇÕES ---
 
-def get_dados_paciente(username):
-    # LÊ DO BANCO
-    df = carregar_dados("usuarios")
-    if df.empty: return None
-    
-    # Tratamento seguro de strings
-    if 'username' in df.columns:
-        df['username_clean'] = df['username'].astype(str).str.strip().str.lower()
-        busca = str(username).strip().lower()
-        
-        user = df[df['username_clean'] == busca]
-        if user.empty: return None
-        return user.iloc[0].to_dict()
-    return None
-
-def get_historico_checkins(username):
-    # LÊ DO BANCO
-    df = carregar_dados("checkins")
-    if df.empty: return pd.DataFrame()
-    
-    if 'username' in df.columns:
-        return df[df['username'] == username]
-    return pd.DataFrame()
-
 def renderizar_campo(row, prefixo=""):
     """Gera o componente visual com chave única para evitar erros de ID"""
     tipo = str(row['tipo']).lower().strip()
@@ -110,25 +88,27 @@ def show_checkin():
         return
 
     # --- MODO PACIENTE ---
-    info_paciente = get_dados_paciente(usuario_atual)
+    info_paciente = perfil_sessao()  # Guardado na sessão desde o login
     if not info_paciente: 
         st.error("Erro ao carregar dados do usuário. Contate o suporte.")
         return
 
-    # Lógica de bloqueio por data/frequência
-    dia_agendado = str(info_paciente.get('dia_checkin', 'Segunda')).strip()
-    frequencia = str(info_paciente.get('frequencia', 'Semanal')).strip()
+    # Lógica de bloqueio por data/frequência (regra única, já calculada em agenda.py)
+    agenda = agenda_do_paciente(usuario_atual)
+    if not agenda:
+        st.error("Erro ao carregar dados do usuário. Contate o suporte.")
+        return
+
+    dia_agendado = DIAS_SEMANA.get(agenda.get('dia_semana'), str(info_paciente.get('dia_checkin', 'Segunda')).strip())
+    frequencia = agenda['frequencia']
     
     data_str = str(info_paciente.get('data_inicio', date.today())).strip()
     try: data_inicio = datetime.strptime(data_str, "%Y-%m-%d").date()
     except: data_inicio = date.today()
 
-    dias_semana = {0: "Segunda", 1: "Terça", 2: "Quarta", 3: "Quinta", 4: "Sexta", 5: "Sábado", 6: "Domingo"}
     hoje = datetime.now().date()
-    hoje_nome = dias_semana[hoje.weekday()]
-
-    df_checks = get_historico_checkins(usuario_atual)
-    total_feitos = len(df_checks)
+    hoje_nome = DIAS_SEMANA[hoje.weekday()]
+    novato = agenda['ultimo_checkin'] is None
 
     bloqueado = False
     motivo = ""
@@ -137,27 +117,19 @@ def show_checkin():
     if hoje_nome != dia_agendado:
         bloqueado = True
         motivo = f"Hoje é **{hoje_nome}**. Seu dia de check-in é **{dia_agendado}**."
-        if total_feitos == 0: mostrar_info_azul = False
-    else:
-        dias_de_plano = (hoje - data_inicio).days
-        if dias_de_plano < 0: dias_de_plano = 0
-
-        if total_feitos == 0:
-            periodo = 7 if frequencia == "Semanal" else 15
-            if dias_de_plano < periodo:
-                bloqueado = True
-                motivo = f"⏳ **Aguarde!** Seu primeiro check-in será liberado em {periodo - dias_de_plano} dias."
-                mostrar_info_azul = False
+        if novato: mostrar_info_azul = False
+    elif agenda['liberado_em'] is None:
+        # Novato sem data de início válida: o primeiro check-in espera o admin preencher a data
+        bloqueado = True
+        motivo = f"⏳ **Aguarde!** Seu primeiro check-in será liberado em {CARENCIA[frequencia][0]} dias."
+        mostrar_info_azul = False
+    elif agenda['liberado_em'] > hoje:
+        bloqueado = True
+        if novato:
+            motivo = f"⏳ **Aguarde!** Seu primeiro check-in será liberado em {(agenda['liberado_em'] - hoje).days} dias."
+            mostrar_info_azul = False
         else:
-            if 'data' in df_checks.columns:
-                df_checks['data_real'] = pd.to_datetime(df_checks['data'], errors='coerce')
-                ultimo_check = df_checks['data_real'].max().date()
-                dias_desde_ultimo = (hoje - ultimo_check).days
-                
-                periodo_trava = 6 if frequencia == "Semanal" else 13
-                if dias_desde_ultimo < periodo_trava:
-                    bloqueado = True
-                    motivo = f"✅ Você já realizou seu check-in {frequencia.lower()}!"
+            motivo = f"✅ Você já realizou seu check-in {frequencia.lower()}!"
 
     if bloqueado:
         st.error(motivo)
@@ -206,8 +178,11 @@ def show_checkin():
                 if 'peso' in respostas and (respostas['peso'] is None or float(respostas['peso']) <= 0):
                     st.warning("Por favor, preencha o seu peso atual corretamente.")
                 else:
+                    # Notas calculadas agora, uma vez só (o admin só lê)
+                    respostas.update(pontuar(respostas))
                     # SALVA NO BANCO POSTGRESQL
                     if salvar_novo_registro(respostas, "checkins"):
+                        atualizar_agenda([usuario_atual])  # Próxima data muda com este envio
                         st.balloons()
                         st.success("Relatório enviado com sucesso! Aguarde o feedback do seu nutricionista.")
                         st.rerun()
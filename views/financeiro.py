@@ -3,7 +3,7 @@ import pandas as pd
 import altair as alt
 from datetime import datetime, date
 # IMPORTS DO BANCO DE DADOS
-from database import carregar_dados, salvar_novo_registro, atualizar_tabela_completa
+from database import carregar_dados, salvar_novo_registro, salvar_registros, atualizar_tabela_completa, delete_rows
 
 # --- FUNÇÕES ÚTEIS ---
 def formatar_moeda(valor):
@@ -65,6 +65,27 @@ def show_financeiro():
                 else:
                     st.warning("O valor deve ser maior que zero.")
 
+    # 1.1 IMPORTAÇÃO EM LOTE (CSV do banco/planilha)
+    with st.expander("📥 Importar Lançamentos (CSV)", expanded=False):
+        st.caption("Colunas obrigatórias: data (AAAA-MM-DD), tipo (Receita/Despesa), categoria, descricao, valor")
+        arquivo = st.file_uploader("Arquivo CSV", type="csv", key="import_financeiro")
+        if arquivo is not None:
+            df_import = pd.read_csv(arquivo, dtype={"descricao": str})
+            obrigatorias = ["data", "tipo", "categoria", "descricao", "valor"]
+            faltando = [c for c in obrigatorias if c not in df_import.columns]
+            if faltando:
+                st.error(f"Colunas faltando no arquivo: {', '.join(faltando)}")
+            else:
+                df_import = df_import[obrigatorias]
+                df_import['valor'] = pd.to_numeric(df_import['valor'], errors='coerce')
+                df_import = df_import.dropna(subset=['valor'])
+                st.dataframe(df_import.head(10), use_container_width=True, hide_index=True)
+                if st.button(f"💾 Importar {len(df_import)} lançamentos", type="primary"):
+                    # Uma única transação para o arquivo inteiro
+                    if salvar_registros(df_import, "financeiro"):
+                        st.success("Importação concluída!")
+                        st.rerun()
+
     # 2. PROCESSAMENTO DE DADOS (LENDO DO BANCO)
     df = carregar_dados("financeiro")
     df_pacientes = carregar_dados("usuarios")
@@ -222,8 +243,8 @@ def show_financeiro():
 
         if st.button("💾 Salvar Alterações na Tabela"):
             if mes_selecionado == "Todos":
-                # Converte datas de volta para string para o banco
-                df_final_edit['data'] = df_final_edit['data'].apply(lambda x: x.strftime('%Y-%m-%d') if pd.notnull(x) else '')
+                # Converte datas de volta para string para o banco (vazia vira NULL: a coluna é DATE)
+                df_final_edit['data'] = df_final_edit['data'].apply(lambda x: x.strftime('%Y-%m-%d') if pd.notnull(x) else None)
                 
                 # ATUALIZA A TABELA INTEIRA NO BANCO
                 atualizar_tabela_completa(df_final_edit, "financeiro")
@@ -233,7 +254,7 @@ def show_financeiro():
             else:
                 st.warning("⚠️ Para editar ou excluir itens, por segurança, selecione o filtro 'Todos' nos meses.")
 
-    # 8. OPÇÃO DE EXCLUSÃO (VIA INDEX)
+    # 8. OPÇÃO DE EXCLUSÃO (VIA ID)
     st.markdown("---")
     with st.expander("🗑️ Excluir Lançamento Específico"):
         if not df_view.empty:
@@ -253,15 +274,8 @@ def show_financeiro():
             )
             
             if st.button("❌ Confirmar Exclusão do Lançamento"):
-                # Remove pelo índice do DataFrame filtrado
-                df_novo = df.drop(id_para_excluir)
-                
-                # Converte datas antes de salvar
-                if 'data' in df_novo.columns:
-                    df_novo['data'] = df_novo['data'].apply(lambda x: x.strftime('%Y-%m-%d') if pd.notnull(x) else '')
-
-                # ATUALIZA BANCO
-                atualizar_tabela_completa(df_novo, "financeiro")
+                # Remove só esta linha, pela chave primária (id)
+                delete_rows("financeiro", {"id": int(df_view.loc[id_para_excluir, 'id'])})
                 
                 st.success("Lançamento removido com sucesso!")
                 st.rerun()
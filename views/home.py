@@ -1,143 +1,125 @@
 import streamlit as st
 import pandas as pd
-from datetime import datetime, timedelta, date
+import numpy as np
+import altair as alt
+from datetime import datetime, date
 # Importamos as funções vitais do banco de dados
-from database import carregar_dados, salvar_novo_registro, atualizar_tabela_completa
+from database import consultar, upsert_rows, executar_sql
+from schema import BITS_CHECKLIST
+from views.avisos_admin import avisos_ativos
+from agenda import agenda_do_paciente, deve_fazer_checkin
+from streak import streak_atual, registrar_dia
 
 # --- CALLBACKS DE NAVEGAÇÃO ---
 def ir_para_calculadora(): st.session_state["menu_opcao"] = "🧮 Calculadora"
 def ir_para_biblioteca(): st.session_state["menu_opcao"] = "📚 Biblioteca"
 def ir_para_checkin(): st.session_state["menu_opcao"] = "📝 Check-in"
 
-# --- FUNÇÕES DE DADOS DE USUÁRIO (MIGRADAS PARA DB) ---
-
-def get_dados_paciente(username):
-    # Carrega tabela usuarios do banco
-    df = carregar_dados("usuarios")
-    if df.empty: return None
-    
-    # Procura o usuário (tratando minúsculas/espaços)
-    username = str(username).strip().lower()
-    
-    # Cria coluna temporária pra busca segura (caso o banco tenha sujeira)
-    if 'username' in df.columns:
-        df['user_clean'] = df['username'].astype(str).str.strip().str.lower()
-        user = df[df['user_clean'] == username]
-        
-        if user.empty: return None
-        return user.iloc[0].to_dict()
-    return None
-
-def ja_fez_checkin_recente(username):
-    # Carrega tabela checkins do banco
-    df = carregar_dados("checkins")
-    if df.empty: return False
-
-    # Filtra pelo usuário
-    if 'username' in df.columns:
-        df_user = df[df['username'] == username].copy()
-        if df_user.empty: return False
-
-        # Converte data e vê a última
-        if 'data' in df_user.columns:
-            df_user['data'] = pd.to_datetime(df_user['data'], errors='coerce')
-            ultima_data = df_user['data'].max().date()
-            
-            hoje = datetime.now().date()
-            dias_desde = (hoje - ultima_data).days
-            
-            return dias_desde < 4 # Se fez há menos de 4 dias, retorna True
-    return False
-
 # --- FUNÇÕES DO CHECKLIST (AGORA NO BANCO) ---
-def carregar_checklist():
-    # Lê direto do Postgres
-    df = carregar_dados("checklist")
-    # Se vier vazio ou sem colunas, cria a estrutura padrão
-    colunas_padrao = ["username", "data", "agua", "cardio", "treino", "dieta", "sono"]
-    if df.empty:
-        return pd.DataFrame(columns=colunas_padrao)
-    return df
+# Cada dia é UM número (coluna tarefas): agua=1, cardio=2, treino=4, dieta=8, sono=16
+TAREFAS_CHECKLIST = list(BITS_CHECKLIST)
+_BITS = np.array(list(BITS_CHECKLIST.values()), dtype=np.int16)
+
+def decodificar_tarefas(mascara):
+    """Número do banco -> {"agua": True, "cardio": False, ...}"""
+    mascara = int(mascara or 0)
+    return {tarefa: bool(mascara & bit) for tarefa, bit in BITS_CHECKLIST.items()}
+
+def matriz_tarefas(mascaras):
+    """Vários dias de uma vez: array de números -> matriz booleana (dias x 5 tarefas)"""
+    return (np.asarray(mascaras, dtype=np.int16)[:, None] & _BITS) != 0
+
+# Primeiro toque do dia cria a linha; os outros só ligam/desligam o bit.
+# Tudo no Postgres, numa instrução: dois cliques ao mesmo tempo não se perdem.
+# {tabela} é "checklist" (o benchmarks/checklist_upsert.py usa uma tabela de teste).
+COMANDO_MARCAR_TAREFA = """
+    INSERT INTO {tabela} (username, data, tarefas) VALUES (:usuario, :data, :inicial)
+    ON CONFLICT (username, data) DO UPDATE SET tarefas = CASE
+        WHEN :feito THEN {tabela}.tarefas | :bit
+        ELSE {tabela}.tarefas & ~CAST(:bit AS SMALLINT)
+    END
+    RETURNING tarefas
+"""
 
 def salvar_tarefa(usuario, tarefa, feito):
-    """Atualiza o checklist no banco de dados"""
-    df = carregar_checklist()
-    hoje = datetime.now().strftime("%Y-%m-%d")
-    
-    # Garante que as colunas existem (caso seja a primeira vez)
-    colunas_padrao = ["username", "data", "agua", "cardio", "treino", "dieta", "sono"]
-    for col in colunas_padrao:
-        if col not in df.columns:
-            df[col] = "False"
-
-    # Procura se já existe registro hoje
-    filtro = (df['username'] == usuario) & (df['data'] == hoje)
-    
-    novo_valor = "True" if feito else "False"
-
-    if filtro.any():
-        # Se existe, atualiza a linha
-        idx = df[filtro].index[0]
-        df.at[idx, tarefa] = novo_valor
+    """Marca/desmarca UMA tarefa do dia (só esse bit é gravado no banco)"""
+    if tarefa not in BITS_CHECKLIST:
+        raise ValueError(f"Tarefa desconhecida: {tarefa}")
+    hoje = datetime.now().date()
+    bit = BITS_CHECKLIST[tarefa]
+
+    linhas = executar_sql(
+        COMANDO_MARCAR_TAREFA.format(tabela="checklist"),
+        {"usuario": usuario, "data": hoje, "inicial": bit if feito else 0, "feito": bool(feito), "bit": bit},
+        tabela="checklist",
+    )
+
+    # Atualiza a sequência de foco com o valor que acabou de ser gravado
+    if linhas:
+        registrar_dia(usuario, hoje, linhas[0]["tarefas"] > 0)
+
+def calendario_tarefas(usuario, dias=365):
+    """
+    Últimos `dias` dias do paciente, um por linha (dias sem registro = 0), numa só consulta.
+    Colunas: data, tarefas (número), feitas (0 a 5).
+    """
+    hoje = pd.Timestamp(date.today())
+    inicio = hoje - pd.Timedelta(days=dias - 1)
+    df = consultar("checklist", colunas=["data", "tarefas"], filtros={"username": usuario, "data__gte": inicio.date()})
+
+    datas = pd.date_range(inicio, hoje, freq="D")
+    mascaras = np.zeros(len(datas), dtype=np.int16)
+    if not df.empty:
+        posicoes = (pd.to_datetime(df["data"]) - inicio).dt.days.to_numpy()
+        validos = (posicoes >= 0) & (posicoes < len(datas))
+        mascaras[posicoes[validos]] = df["tarefas"].fillna(0).to_numpy(dtype=np.int16)[validos]
+
+    return pd.DataFrame({
+        "data": datas,
+        "tarefas": mascaras,
+        "feitas": matriz_tarefas(mascaras).sum(axis=1),
+    })
+
+def taxa_adesao(calendario, periodo="W"):
+    """
+    % das tarefas cumpridas por semana ("W") ou mês ("M"), calculado em NumPy.
+    Retorna DataFrame (inicio do período, adesao de 0 a 1).
+    """
+    datas = calendario["data"].to_numpy().astype("datetime64[D]")
+    if periodo == "M":
+        chaves = datas.astype("datetime64[M]")
     else:
-        # Se não existe, cria nova linha
-        nova_linha = {
-            "username": usuario, 
-            "data": hoje, 
-            "agua": "False", "cardio": "False", "treino": "False", "dieta": "False", "sono": "False"
-        }
-        nova_linha[tarefa] = novo_valor
-        df = pd.concat([df, pd.DataFrame([nova_linha])], ignore_index=True)
-    
-    # Salva a tabela atualizada no banco
-    atualizar_tabela_completa(df, "checklist")
+        # Semanas começando na segunda (1970-01-05 foi uma segunda)
+        chaves = datas - ((datas - np.datetime64("1970-01-05")).astype(int) % 7)
+    periodos, grupo = np.unique(chaves, return_inverse=True)
+    feitas = np.bincount(grupo, weights=calendario["feitas"].to_numpy())
+    possiveis = np.bincount(grupo) * len(BITS_CHECKLIST)
+    return pd.DataFrame({"inicio": periodos.astype("datetime64[ns]"), "adesao": feitas / possiveis})
+
+def grafico_calendario(calendario):
+    """Mapa de calor estilo GitHub: colunas = semanas, linhas = dias da semana"""
+    df = calendario.copy()
+    df["semana"] = df["data"] - pd.to_timedelta(df["data"].dt.weekday, unit="D")
+    df["dia"] = df["data"].dt.weekday.map({0: "Seg", 1: "Ter", 2: "Qua", 3: "Qui", 4: "Sex", 5: "Sáb", 6: "Dom"})
+    return alt.Chart(df).mark_rect(cornerRadius=2).encode(
+        x=alt.X("yearmonthdate(semana):O", title=None, axis=alt.Axis(labels=False, ticks=False)),
+        y=alt.Y("dia:O", sort=["Seg", "Ter", "Qua", "Qui", "Sex", "Sáb", "Dom"], title=None),
+        color=alt.Color("feitas:Q", scale=alt.Scale(domain=[0, len(BITS_CHECKLIST)], scheme="greens"), legend=None),
+        tooltip=[alt.Tooltip("data:T", title="Dia", format="%d/%m/%Y"), alt.Tooltip("feitas:Q", title="Tarefas")],
+    ).properties(height=140)
 
 def calcular_streak(usuario):
-    df = carregar_checklist()
-    if df.empty: return 0
-    
-    if 'username' not in df.columns: return 0
-    df_user = df[df['username'] == usuario].copy()
-    if df_user.empty: return 0
-    
-    if 'data' in df_user.columns:
-        df_user['data'] = pd.to_datetime(df_user['data'])
-        df_user = df_user.sort_values('data', ascending=False)
-        
-        colunas_tarefas = ["agua", "cardio", "treino", "dieta", "sono"]
-        
-        # Função auxiliar para verificar se fez pelo menos 1 coisa no dia
-        def fez_algo(row): 
-            return any(str(row.get(col, 'False')) == 'True' for col in colunas_tarefas)
-        
-        streak = 0
-        hoje = datetime.now().date()
-        ontem = hoje - timedelta(days=1)
-        datas_ativas = set()
-        
-        for idx, row in df_user.iterrows():
-            if fez_algo(row): datas_ativas.add(row['data'].date())
-                
-        current_check = hoje
-        # Se não fez hoje ainda, checa a partir de ontem para não zerar o streak
-        if current_check not in datas_ativas: current_check = ontem 
-        
-        while current_check in datas_ativas:
-            streak += 1
-            current_check -= timedelta(days=1)
-            
-        return streak
-    return 0
+    # Estado já calculado em 'streaks' (ver streak.py): lê uma linha só
+    return streak_atual(usuario)
 
 # --- FUNÇÕES AUXILIARES VÍDEO (MIGRADAS) ---
 def verificar_se_video_concluido(usuario, modulo_video):
-    df = carregar_dados("conclusao_aulas") # Nome da tabela no banco
-    if df.empty: return False
-    
-    if 'username' in df.columns and 'modulo' in df.columns:
-        concluido = df[(df['username'] == usuario) & (df['modulo'] == modulo_video)]
-        return not concluido.empty
-    return False
+    # Basta existir uma linha para este usuário/módulo
+    concluido = consultar(
+        "conclusao_aulas", colunas=["modulo"],
+        filtros={"username": usuario, "modulo": modulo_video}, limite=1
+    )
+    return not concluido.empty
 
 def marcar_video_concluido(usuario, modulo_video):
     novo = {
@@ -145,8 +127,8 @@ def marcar_video_concluido(usuario, modulo_video):
         "modulo": modulo_video, 
         "data": str(datetime.now())
     }
-    # Salva apenas o novo registro (mais eficiente que reescrever tudo)
-    salvar_novo_registro(novo, "conclusao_aulas")
+    # Salva apenas este registro (chave username + modulo: clicar duas vezes não duplica)
+    upsert_rows("conclusao_aulas", novo)
 
 # --- POP-UP DE CHECK-IN ---
 @st.dialog("🔔 Lembrete Importante")
@@ -166,61 +148,12 @@ def show_home():
     nome_usuario = st.session_state.get("nome", "Paciente")
     login_usuario = st.session_state.get("usuario_atual", "")
     
-    # 1. AVISOS (Carrega do Banco)
-    df_avisos = carregar_dados("avisos")
-    if not df_avisos.empty:
-        try:
-            agora = datetime.now()
-            # Garante que as colunas existem
-            if 'expiracao' in df_avisos.columns and 'mensagem' in df_avisos.columns:
-                for _, row in df_avisos.iterrows():
-                    try:
-                        expira = pd.to_datetime(row['expiracao'])
-                        if agora < expira:
-                            st.error(row['mensagem'])
-                    except: pass
-        except Exception:
-            pass      
+    # 1. AVISOS (só os que ainda valem, já filtrados pelo banco e guardados em cache)
+    for mensagem in avisos_ativos():
+        st.error(mensagem)
 
-    # 2. LÓGICA DE COBRANÇA DE CHECK-IN
-    info = get_dados_paciente(login_usuario)
-    deve_cobrar = False
-    
-    if info:
-        dia_agendado = str(info.get('dia_checkin', 'Segunda')).strip()
-        frequencia = str(info.get('frequencia', 'Semanal')).strip()
-        
-        dias_semana = {0: "Segunda", 1: "Terça", 2: "Quarta", 3: "Quinta", 4: "Sexta", 5: "Sábado", 6: "Domingo"}
-        hoje = datetime.now().date()
-        hoje_nome = dias_semana[hoje.weekday()]
-        
-        data_str = str(info.get('data_inicio', date.today())).strip()
-        try: data_inicio = datetime.strptime(data_str, "%Y-%m-%d").date()
-        except: data_inicio = date.today()
-        
-        dias_de_plano = (hoje - data_inicio).days
-        if dias_de_plano < 0: dias_de_plano = 0
-        
-        eh_dia = (hoje_nome == dia_agendado)
-        carencia_ok = False
-        
-        # Verifica carência olhando no banco de checkins
-        df_checks = carregar_dados("checkins")
-        fez_antes = False
-        if not df_checks.empty:
-            if 'username' in df_checks.columns:
-                if not df_checks[df_checks['username'] == login_usuario].empty:
-                    fez_antes = True
-        
-        if not fez_antes: # Novato
-            if frequencia == "Semanal" and dias_de_plano >= 7: carencia_ok = True
-            elif frequencia == "Quinzenal" and dias_de_plano >= 15: carencia_ok = True
-        else: # Veterano
-            carencia_ok = True
-
-        if eh_dia and carencia_ok:
-            if not ja_fez_checkin_recente(login_usuario):
-                deve_cobrar = True
+    # 2. LÓGICA DE COBRANÇA DE CHECK-IN (regra única, já calculada em agenda.py)
+    deve_cobrar = deve_fazer_checkin(agenda_do_paciente(login_usuario))
 
     # EXIBE O POP-UP SE NECESSÁRIO
     if deve_cobrar:
@@ -246,6 +179,17 @@ def show_home():
     with col_streak:
         st.metric("🔥 Foco", f"{dias_foco} dias", "+1" if dias_foco > 0 else "")
 
+    # Constância do último ano (uma consulta só)
+    calendario = calendario_tarefas(login_usuario)
+    if calendario["feitas"].any():
+        with st.expander("📅 Sua constância no último ano"):
+            semanas = taxa_adesao(calendario, "W")
+            meses = taxa_adesao(calendario, "M")
+            col_sem, col_mes = st.columns(2)
+            col_sem.metric("Esta semana", f"{semanas['adesao'].iloc[-1]:.0%}")
+            col_mes.metric("Este mês", f"{meses['adesao'].iloc[-1]:.0%}")
+            st.altair_chart(grafico_calendario(calendario), use_container_width=True)
+
     st.markdown("---")
 
     # Vídeo e Dieta
@@ -254,10 +198,8 @@ def show_home():
     
     # Tenta carregar vídeo do banco
     if not ja_viu:
-        df_videos = carregar_dados("videos")
-        if not df_videos.empty and 'modulo' in df_videos.columns:
-            video_bv = df_videos[df_videos['modulo'] == 'Boas Vindas']
-            if not video_bv.empty: dados_video = video_bv.iloc[0]
+        video_bv = consultar("videos", filtros={"modulo": "Boas Vindas"}, limite=1)
+        if not video_bv.empty: dados_video = video_bv.iloc[0]
 
     if dados_video is not None:
         col_video, col_dieta = st.columns(2, gap="medium")
@@ -2,7 +2,7 @@ import streamlit as st
 import pandas as pd
 from datetime import datetime
 # IMPORTS DO BANCO DE DADOS
-from database import carregar_dados, salvar_novo_registro, atualizar_tabela_completa
+from database import carregar_dados, consultar, salvar_novo_registro, update_rows
 
 # --- VISÃO DO NUTRICIONISTA (ADMIN) ---
 def exibir_visao_admin():
@@ -33,33 +33,22 @@ def exibir_visao_admin():
     )
 
     if sel_user:
-        # Carregamos todos os registros do Banco
-        df_all = carregar_dados("beliscadas")
-        
-        if df_all.empty:
-            st.info("Nenhum registro de beliscada encontrado até o momento.")
-            return
-
-        # Filtra visualização
-        df_paciente = df_all[df_all['username'] == sel_user].copy()
+        # Carregamos só os registros deste paciente
+        df_paciente = consultar("beliscadas", filtros={"username": sel_user})
 
         if df_paciente.empty:
             st.write(f"✅ O paciente **{dict_nomes.get(sel_user, sel_user)}** ainda não registrou beliscadas.")
         else:
             # --- LÓGICA DE REVISÃO ---
             # Verificamos se há registros pendentes APENAS deste paciente
-            pendentes = df_paciente[df_paciente['status'] == 'Pendente']
+            pendentes = df_paciente[df_paciente['status'] == 'Pendente'] if 'status' in df_paciente.columns else df_paciente.head(0)
             
             if not pendentes.empty:
                 st.warning(f"🔔 Existem {len(pendentes)} novos registros para revisar.")
                 
                 if st.button(f"✅ Marcar registros de {dict_nomes.get(sel_user, sel_user)} como Lidos", type="primary", use_container_width=True):
-                    # Atualiza o status no DataFrame PRINCIPAL (df_all) e não na cópia
-                    # Localiza as linhas desse usuário que estão pendentes e muda para Revisado
-                    df_all.loc[(df_all['username'] == sel_user) & (df_all['status'] == 'Pendente'), 'status'] = 'Revisado'
-                    
-                    # Salva a tabela inteira atualizada no Postgres
-                    atualizar_tabela_completa(df_all, "beliscadas")
+                    # Um único UPDATE nas linhas pendentes deste usuário
+                    update_rows("beliscadas", {"status": "Revisado"}, {"username": sel_user, "status": "Pendente"})
                     
                     st.success("Registros revisados com sucesso!")
                     st.rerun() # Recarrega para limpar os avisos
@@ -133,20 +122,11 @@ def exibir_visao_paciente():
     st.divider()
     st.subheader("📜 Seu Histórico Recente")
 
-    # Carrega do Banco
-    df_historico = carregar_dados("beliscadas")
+    # Carrega do Banco só os registros do usuário atual, já em ordem decrescente
+    df_seu = consultar("beliscadas", filtros={"username": usuario_atual}, ordem=["-data", "-hora"])
 
-    if not df_historico.empty:
-        # Filtra só o usuário atual
-        if 'username' in df_historico.columns:
-            df_seu = df_historico[df_historico["username"] == usuario_atual]
-            
-            # Ordena decrescente
-            if 'data' in df_seu.columns:
-                df_seu['data_dt'] = pd.to_datetime(df_seu['data'], errors='coerce')
-                df_seu = df_seu.sort_values('data_dt', ascending=False)
-            
-            st.dataframe(df_seu, use_container_width=True, hide_index=True)
+    if not df_seu.empty:
+        st.dataframe(df_seu.drop(columns=['id'], errors='ignore'), use_container_width=True, hide_index=True)
     else:
         st.info("Nenhum registro encontrado.")
 
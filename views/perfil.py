@@ -2,7 +2,7 @@ import streamlit as st
 import pandas as pd
 import time
 # IMPORTAÇÃO DO BANCO
-from database import carregar_dados, atualizar_tabela_completa
+from database import update_rows, buscar_usuario, perfil_sessao
 
 def show_perfil():
     st.title("👤 Meu Perfil")
@@ -15,24 +15,13 @@ def show_perfil():
         st.error("Sessão expirada. Faça login novamente.")
         return
 
-    # Carrega dados do Banco
-    df = carregar_dados("usuarios")
+    # Cadastro guardado na sessão desde o login (sem ir ao banco)
+    dados_usuario = perfil_sessao()
     
-    # Verifica se a tabela está vazia ou se não tem a coluna username
-    if df.empty or 'username' not in df.columns:
-        st.error("Erro ao carregar dados do usuário.")
-        return
-
-    # Filtra o usuário atual com segurança
-    filtro_usuario = df['username'] == usuario_atual
-    
-    if not filtro_usuario.any():
+    if not dados_usuario:
         st.error("Erro crítico: Usuário não encontrado no banco de dados.")
         return
 
-    # Pega os dados da primeira ocorrência encontrada
-    dados_usuario = df[filtro_usuario].iloc[0]
-
     # Layout
     col_info, col_seguranca = st.columns([1, 1.5], gap="large")
 
@@ -93,8 +82,9 @@ def show_perfil():
                 btn_salvar = st.form_submit_button("🔄 Atualizar Senha", type="primary", use_container_width=True)
 
                 if btn_salvar:
-                    # Senha armazenada no Banco
-                    senha_real = str(dados_usuario.get('password', '')).strip()
+                    # Senha armazenada no Banco (não fica na sessão: lê só na hora de conferir)
+                    cadastro = buscar_usuario(usuario_atual) or {}
+                    senha_real = str(cadastro.get('password', '')).strip()
                     senha_digitada = str(senha_atual_input).strip()
                     
                     # 1. Validações
@@ -110,11 +100,8 @@ def show_perfil():
                     else:
                         # 2. ATUALIZAÇÃO SEGURA NO BANCO
                         try:
-                            # Localiza e atualiza no DataFrame original
-                            df.loc[df['username'] == usuario_atual, 'password'] = str(nova_senha).strip()
-                            
-                            # Salva a tabela inteira atualizada no PostgreSQL
-                            atualizar_tabela_completa(df, "usuarios")
+                            # Um UPDATE só na linha deste usuário
+                            update_rows("usuarios", {"password": str(nova_senha).strip()}, {"username": usuario_atual})
                             
                             st.success("Senha alterada com sucesso! 🔒")
                             st.info("A página será recarregada em instantes...")